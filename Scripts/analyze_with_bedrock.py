@@ -1,6 +1,19 @@
 # scripts/analyze_with_bedrock.py
-import os, sys, json, argparse, boto3
+import os, sys
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+import json, gzip, time, argparse, asyncio, aioboto3, aiohttp, boto3, orjson
+import hashlib
+from heapq import nlargest
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from urllib.parse import quote
+from yarl import URL
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.exceptions import ClientError
 from dotenv import load_dotenv
+from utils import PLATFORM_TO_CLUSTER, get_puuid_from_riot_id, _backoff, _retry_after
 
 # -------------------------------
 # ENV / AWS clients
@@ -12,60 +25,148 @@ S3_BUCKET  = os.getenv("S3_BUCKET")
 RIOT_API_KEY = os.getenv("RIOT_API_KEY")
 # Claude 3.5 via Inference Profile ARN (REQUIRED for many accounts)
 BEDROCK_INFERENCE_PROFILE_ARN = os.getenv("BEDROCK_INFERENCE_PROFILE_ARN")
+# Batch inference: service role Bedrock assumes to read/write the job files in S3
+BEDROCK_BATCH_ROLE_ARN = os.getenv("BEDROCK_BATCH_ROLE_ARN")
+BEDROCK_BATCH_MODEL_ID = os.getenv("BEDROCK_BATCH_MODEL_ID") or BEDROCK_INFERENCE_PROFILE_ARN
+BATCH_MIN_RECORDS  = int(os.getenv("BATCH_MIN_RECORDS", "100"))  # Bedrock's per-job minimum
+BATCH_POLL_SECONDS = 30
+# Parallel on-demand Converse calls when a batch is too small for a batch job
+BEDROCK_CONCURRENCY = int(os.getenv("BEDROCK_CONCURRENCY", "8"))
+# Converse attempts per report; throttles (429) and 5xx are retried with jittered backoff
+BEDROCK_MAX_ATTEMPTS = 5
+# Opt-in (BEDROCK_PROMPT_CACHE=1): mark the static system prompt as a Converse cache point.
+# Only pays off once the prompt passes the model's minimum cacheable size, and models
+# without prompt caching reject the block, so it is off by default.
+BEDROCK_PROMPT_CACHE = os.getenv("BEDROCK_PROMPT_CACHE", "0") == "1"
+
+# Pull only the KPI fields we use via S3 Select (set to 0 where S3 Select isn't enabled)
+KPI_S3_SELECT = os.getenv("KPI_S3_SELECT", "1") != "0"
+
+# One session for the whole process; clients are opened per call with `async with`
+session = aioboto3.Session()
+
+# Converse is a single JSON POST, so we sign it ourselves and skip the botocore client
+BEDROCK_RUNTIME_URL = f"https://bedrock-runtime.{AWS_REGION}.amazonaws.com"
+_credentials = None
 
-s3 = boto3.client("s3", region_name=AWS_REGION)
-bedrock = boto3.client("bedrock-runtime", region_name=AWS_REGION)
+def _aws_credentials():
+    """Resolve AWS credentials once; refreshable creds renew themselves on access."""
+    global _credentials
+    if _credentials is None:
+        _credentials = boto3.Session().get_credentials()
+    return _credentials
 
 # -------------------------------
 # Riot routing (for optional --riot-id resolve)
 # -------------------------------
-PLATFORM_TO_CLUSTER = {
-    "na":"americas","na1":"americas","br":"americas","br1":"americas","lan":"americas","la1":"americas","las":"americas","la2":"americas",
-    "euw":"europe","euw1":"europe","eune":"europe","eun1":"europe","tr":"europe","tr1":"europe","ru":"europe",
-    "kr":"asia","jp":"asia","jp1":"asia",
-    "oce":"sea","oc1":"sea","ph":"sea","ph2":"sea","sg":"sea","sg2":"sea","th":"sea","th2":"sea","tw":"sea","tw2":"sea","vn":"sea","vn2":"sea",
-}
-
 def resolve_puuid(riot_id: str, region: str) -> str:
     assert RIOT_API_KEY, "Missing RIOT_API_KEY in secrets/.env"
-    if "#" not in riot_id:
-        raise ValueError("Riot ID must be GameName#TAG")
-    game, tag = riot_id.split("#", 1)
-    cluster = PLATFORM_TO_CLUSTER.get(region.lower(), "americas")
-    url = f"https://{cluster}.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{game}/{tag}"
-    import requests
-    r = requests.get(url, headers={"X-Riot-Token": RIOT_API_KEY}, timeout=20)
-    r.raise_for_status()
-    return r.json()["puuid"]
+    cluster = PLATFORM_TO_CLUSTER.get(region) or PLATFORM_TO_CLUSTER.get(region.lower(), "americas")
+    # pooled session + 429/5xx retries from utils
+    return get_puuid_from_riot_id(cluster, riot_id)
 
 # -------------------------------
 # S3 helpers
 # -------------------------------
-def load_kpis_from_s3(puuid: str, year: str) -> dict:
-    key = f"kpis/{puuid}/{year}.json"
-    try:
-        obj = s3.get_object(Bucket=S3_BUCKET, Key=key)
-        return json.loads(obj["Body"].read())
-    except s3.exceptions.NoSuchKey:
-        prefix = f"kpis/{puuid}/"
-        print(f"❌ Not found: s3://{S3_BUCKET}/{key}")
-        print("🔎 Listing available KPI files for this PUUID:")
-        resp = s3.list_objects_v2(Bucket=S3_BUCKET, Prefix=prefix)
-        for it in resp.get("Contents", []):
-            print(" -", it["Key"])
-        raise
-    except Exception as e:
-        print(f"S3 error: {e}")
-        raise
+# Top-level KPI fields that reach the prompt (compact_kpis keeps only these);
+# S3 Select returns just these instead of the whole doc
+_SELECT_FIELDS = (
+    "games", "winrate", "avg_game_time_min",
+    "kill_participation_mean", "damage_share_mean", "cs_per_min_mean", "vision_pm_mean",
+    "gold_per_min_mean", "dmg_per_min_mean", "objective_contrib_mean", "objective_damage_pm_mean",
+    "first_blood_rate_self", "favorite_damage_type",
+    "turrets_killed_total", "dragons_killed_total", "barons_killed_total",   # objectives
+    "heralds_killed_total", "grubs_killed_total", "objective_damage_total",
+    "when_team_first_blood", "when_first_tower", "when_first_dragon",        # conditional winrates (team firsts)
+    "when_first_baron", "when_first_herald",
+    "top_champions", "champion_winrates", "role_distribution",
+    "favorite_items", "best_items", "worst_items",
+    "duo_most_played", "duo_best", "duo_worst",
+    "split_ranked_solo_duo", "split_ranked_flex", "split_normals",
+)
+_SELECT_SQL = "SELECT " + ", ".join(f's.kpis."{f}" AS "{f}"' for f in _SELECT_FIELDS) + " FROM S3Object s"
+
+async def _select_kpis(s3, key: str, puuid: str, year: str) -> dict | None:
+    """
+    Project the KPI fields server-side with S3 Select. Returns None when nothing
+    matched (e.g. a bare KPI dict without the "kpis" wrapper); raises ClientError
+    if Select is unavailable.
+    """
+    resp = await s3.select_object_content(
+        Bucket=S3_BUCKET, Key=key,
+        Expression=_SELECT_SQL, ExpressionType="SQL",
+        InputSerialization={"JSON": {"Type": "DOCUMENT"},
+                            "CompressionType": "GZIP" if key.endswith(".gz") else "NONE"},
+        OutputSerialization={"JSON": {"RecordDelimiter": "\n"}},
+    )
+    chunks = []
+    async for event in resp["Payload"]:
+        if "Records" in event:
+            chunks.append(event["Records"]["Payload"])
+    record = b"".join(chunks).split(b"\n", 1)[0].strip()
+    kpis = orjson.loads(record) if record else {}
+    return {"puuid": puuid, "year": year, "kpis": kpis} if kpis else None
+
+async def _load_kpis_key(s3, key: str, puuid: str, year: str) -> dict:
+    if KPI_S3_SELECT:
+        try:
+            doc = await _select_kpis(s3, key, puuid, year)
+            if doc:
+                return doc
+        except ClientError:
+            pass  # Select not enabled for this account, or missing key: full GET below reports it
+    obj = await s3.get_object(Bucket=S3_BUCKET, Key=key)
+    body = await obj["Body"].read()
+    if obj.get("ContentEncoding") == "gzip" or key.endswith(".gz"):
+        body = gzip.decompress(body)
+    return orjson.loads(body)
+
+async def load_kpis_from_s3(puuid: str, year: str) -> dict:
+    key = f"kpis/{puuid}/{year}.json.gz"
+    async with session.client("s3", region_name=AWS_REGION) as s3:
+        try:
+            try:
+                return await _load_kpis_key(s3, key, puuid, year)
+            except s3.exceptions.NoSuchKey:
+                key = f"kpis/{puuid}/{year}.json"  # legacy uncompressed upload
+                return await _load_kpis_key(s3, key, puuid, year)
+        except s3.exceptions.NoSuchKey:
+            prefix = f"kpis/{puuid}/"
+            print(f"❌ Not found: s3://{S3_BUCKET}/{key}")
+            print("🔎 Listing available KPI files for this PUUID:")
+            resp = await s3.list_objects_v2(Bucket=S3_BUCKET, Prefix=prefix)
+            for it in resp.get("Contents", []):
+                print(" -", it["Key"])
+            raise
+        except Exception as e:
+            print(f"S3 error: {e}")
+            raise
 
 # -------------------------------
 # Compaction to stay under token limits
 # -------------------------------
-def _top_n(lst, key=lambda x: x, n=10):
-    try:
-        return sorted(lst, key=key, reverse=True)[:n]
-    except Exception:
-        return lst[:n]
+def _games(x):
+    return x.get("games", 0)
+
+def _top_n(lst, key=_games, n=10):
+    # heap-based partial sort: O(M log n) and same order as sorted(..., reverse=True)[:n]
+    return nlargest(n, lst, key=key) if lst else []
+
+_KEEP = frozenset(_SELECT_FIELDS)
+# Applied to nested keys too, so debug/raw payloads never leak into the slice
+_DROP = ("debug*", "trace*", "raw*", "internal_*", "*_ts", "*_timestamp",
+         "*_puuid")                                        # e.g. duo mate_puuid: 78 opaque chars, no coaching value
+
+def _matches(name: str, patterns) -> bool:
+    return any(fnmatchcase(name, p) for p in patterns)
+
+def _strip(v):
+    """Recursively remove _DROP keys from nested dicts/lists."""
+    if isinstance(v, dict):
+        return {kk: _strip(vv) for kk, vv in v.items() if not _matches(kk, _DROP)}
+    if isinstance(v, list):
+        return [_strip(x) for x in v]
+    return v
 
 def compact_kpis(kpis_doc: dict,
                  keep_champs=12,
@@ -78,106 +179,130 @@ def compact_kpis(kpis_doc: dict,
     Accepts either {puuid,year,kpis:{...}} or a bare KPI dict.
     """
     k = kpis_doc.get("kpis") or kpis_doc
+    n_champs, n_items = min(keep_champs, 12), min(keep_items, 6)
     out = {}
 
-    # Headline aggregates
-    for fld in [
-        "games","winrate","avg_game_time_min",
-        "kill_participation_mean","damage_share_mean","cs_per_min_mean",
-        "vision_pm_mean","gold_per_min_mean","dmg_per_min_mean",
-        "objective_contrib_mean","objective_damage_pm_mean",
-        "first_blood_rate_self","favorite_damage_type"
-    ]:
-        if fld in k: out[fld] = k[fld]
-
-    # Objectives
-    for fld in ["turrets_killed_total","dragons_killed_total","barons_killed_total",
-                "heralds_killed_total","grubs_killed_total","objective_damage_total"]:
-        if fld in k:
-            if drop_zero_objectives and not k[fld]:
-                continue
-            out[fld] = k[fld]
-
-    # Conditional winrates (team firsts)
-    for fld in ["when_team_first_blood","when_first_tower","when_first_dragon",
-                "when_first_baron","when_first_herald"]:
-        if fld in k and isinstance(k[fld], dict):
-            out[fld] = {kk: k[fld].get(kk) for kk in ("games","winrate")}
+    for fld, v in k.items():
+        if fld not in _KEEP or _matches(fld, _DROP):
+            continue
+        if fld.startswith("duo_") and not keep_duos:
+            continue
+        if fld.endswith("_total") and drop_zero_objectives and not v:
+            continue
 
-    # Top champs (by games)
-    if "top_champions" in k:
-        out["top_champions"] = _top_n(k["top_champions"], key=lambda x: x.get("games",0), n=min(keep_champs, 12))
-
-    # Role distribution
-    if "role_distribution" in k:
-        out["role_distribution"] = k["role_distribution"]
-
-    # Champion winrates (trim)
-    if "champion_winrates" in k:
-        out["champion_winrates"] = _top_n(k["champion_winrates"], key=lambda x: x.get("games",0), n=min(keep_champs, 12))
+        if fld.startswith("when_"):
+            if not isinstance(v, dict):
+                continue
+            v = {kk: v.get(kk) for kk in ("games", "winrate")}
+        elif fld in ("top_champions", "champion_winrates"):
+            v = _top_n(v, n=n_champs)      # by games
+        elif fld.endswith("_items"):
+            if not isinstance(v, list):
+                continue
+            v = _top_n(v, n=n_items)
 
-    # Items (trim)
-    for fld in ["favorite_items","best_items","worst_items"]:
-        if fld in k and isinstance(k[fld], list):
-            out[fld] = _top_n(k[fld], key=lambda x: x.get("games",0), n=min(keep_items, 6))
+        out[fld] = _strip(v)
 
-    # Duos
-    if keep_duos:
-        for fld in ["duo_most_played","duo_best","duo_worst"]:
-            if fld in k: out[fld] = k[fld]
+    return out
 
-    # Queue splits
-    for fld in ["split_ranked_solo_duo","split_ranked_flex","split_normals"]:
-        if fld in k: out[fld] = k[fld]
+# Re-runs/retries of the same report reuse the slim dict, keyed by a content hash of the doc
+_COMPACT_MEMO: OrderedDict = OrderedDict()
+_COMPACT_MEMO_SIZE = 64
 
-    return out
+def compact_kpis_cached(kpis_doc: dict, **opts) -> dict:
+    """Memoized compact_kpis(); the returned dict is shared, treat it as read-only."""
+    digest = hashlib.blake2b(orjson.dumps(kpis_doc, option=orjson.OPT_SORT_KEYS), digest_size=16).digest()
+    key = (digest, tuple(sorted(opts.items())))
+    if key in _COMPACT_MEMO:
+        _COMPACT_MEMO.move_to_end(key)
+        return _COMPACT_MEMO[key]
+    slim = _COMPACT_MEMO[key] = compact_kpis(kpis_doc, **opts)
+    if len(_COMPACT_MEMO) > _COMPACT_MEMO_SIZE:
+        _COMPACT_MEMO.popitem(last=False)
+    return slim
 
 # -------------------------------
 # Bedrock (Claude 3.5 via Converse + Inference Profile)
 # -------------------------------
-def analyze_with_bedrock(kpis_doc: dict) -> str:
+# Static instructions live in the system block so Bedrock can cache them across calls;
+# only the KPI slice changes per request.
+SYSTEM_PROMPT = (
+    "You are a League of Legends coach.\n"
+    "The info you output should be in a fun playful way. Banter if possible but don't be mean.\n"
+    "Write ONLY the final report in clean Markdown. No JSON, no prefaces.\n\n"
+    "## Summary\n"
+    "- 3–5 bullets (games, winrate, avg game length)\n\n"
+    "## Playstyle\n"
+    "- kill participation, damage share, cs/min, vision/min, gold/min, dmg/min\n\n"
+    "## Objectives\n"
+    "- totals + conditional winrates when first objective secured\n\n"
+    "## Mains & Roles\n"
+    "- top champions with winrates; role distribution\n\n"
+    "## Items & Duos\n"
+    "- favorite items; best/worst items by winrate; most-played/best/worst duo\n\n"
+    "## Coaching Insights\n"
+    "- 6–10 specific, actionable suggestions tied to the numbers\n"
+)
+
+def build_prompt(kpis_doc: dict) -> str:
+    # Compact a bit to reduce costs and avoid hitting length
+    slim = compact_kpis_cached(kpis_doc, keep_champs=10, keep_items=6)
+    return f"KPI JSON (slice):\n{orjson.dumps(slim).decode()}\n"
+
+def _system_blocks() -> list[dict]:
+    blocks = [{"text": SYSTEM_PROMPT}]
+    if BEDROCK_PROMPT_CACHE:
+        blocks.append({"cachePoint": {"type": "default"}})
+    return blocks
+
+async def analyze_with_bedrock(kpis_doc: dict, http: aiohttp.ClientSession | None = None) -> str:
+    """
+    One on-demand Converse call. Pass a shared `http` session when generating
+    many reports so the TLS connection to Bedrock is reused.
+    """
     if not BEDROCK_INFERENCE_PROFILE_ARN:
         raise RuntimeError("BEDROCK_INFERENCE_PROFILE_ARN is required for Claude 3.5. Set it in secrets/.env")
+    if http is None:
+        async with aiohttp.ClientSession() as http:
+            return await analyze_with_bedrock(kpis_doc, http)
 
-    # Compact a bit to reduce costs and avoid hitting length
-    slim = compact_kpis(kpis_doc, keep_champs=12, keep_items=6)
-
-    prompt = (
-        "You are a League of Legends coach.\n"
-        "The info you output should be in a fun playful way. Banter if possible but don't be mean.\n"
-        "Write ONLY the final report in clean Markdown. No JSON, no prefaces.\n\n"
-        "## Summary\n"
-        "- 3–5 bullets (games, winrate, avg game length)\n\n"
-        "## Playstyle\n"
-        "- kill participation, damage share, cs/min, vision/min, gold/min, dmg/min\n\n"
-        "## Objectives\n"
-        "- totals + conditional winrates when first objective secured\n\n"
-        "## Mains & Roles\n"
-        "- top champions with winrates; role distribution\n\n"
-        "## Items & Duos\n"
-        "- favorite items; best/worst items by winrate; most-played/best/worst duo\n\n"
-        "## Coaching Insights\n"
-        "- 6–10 specific, actionable suggestions tied to the numbers\n\n"
-        f"KPI JSON (slice):\n{json.dumps(slim, separators=(',',':'))}\n"
-    )
+    prompt = build_prompt(kpis_doc)
 
     # Mirror the AWS Playground style: pass the inference profile ARN as modelId
-    resp = bedrock.converse(
-        modelId=BEDROCK_INFERENCE_PROFILE_ARN,
-        messages=[{"role": "user", "content": [{"text": prompt}]}],
-        inferenceConfig={
+    body = orjson.dumps({
+        "system": _system_blocks(),
+        "messages": [{"role": "user", "content": [{"text": prompt}]}],
+        "inferenceConfig": {
             "maxTokens": 2000,
             "stopSequences": ["\n\nHuman:"],
             "temperature": 0.5,
             "topP": 0.999
         },
-        additionalModelRequestFields={
+        "additionalModelRequestFields": {
             "top_k": 250
         },
-        performanceConfig={
+        "performanceConfig": {
             "latency": "standard"
         }
-    )
+    })
+    url = f"{BEDROCK_RUNTIME_URL}/model/{quote(BEDROCK_INFERENCE_PROFILE_ARN, safe='')}/converse"
+    for attempt in range(BEDROCK_MAX_ATTEMPTS):
+        # signed per attempt: the signature carries a timestamp
+        req = AWSRequest(method="POST", url=url, data=body, headers={"Content-Type": "application/json"})
+        SigV4Auth(_aws_credentials(), "bedrock", AWS_REGION).add_auth(req)
+        prepped = req.prepare()
+
+        # encoded=True: send the path byte-for-byte as signed (the ARN's %3A / %2F must survive)
+        async with http.post(URL(prepped.url, encoded=True), headers=dict(prepped.headers), data=body) as r:
+            if r.status < 400:
+                resp = orjson.loads(await r.read())
+                break
+            error = f"Bedrock Converse failed ({r.status}): {await r.text()}"
+            retryable = r.status == 429 or r.status >= 500
+            wait = _retry_after(r.headers, default=_backoff(attempt))
+        if not retryable or attempt == BEDROCK_MAX_ATTEMPTS - 1:
+            raise RuntimeError(error)
+        await asyncio.sleep(wait)
 
     # Parse Converse output
     try:
@@ -186,6 +311,136 @@ def analyze_with_bedrock(kpis_doc: dict) -> str:
         # If the structure changes, return the raw response for debugging
         return json.dumps(resp, indent=2)
 
+def _recap_hash(kpis_doc: dict) -> str:
+    """Content hash of everything that shapes a report: model, system prompt and KPI slice."""
+    h = hashlib.sha256()
+    for part in (BEDROCK_INFERENCE_PROFILE_ARN or "", SYSTEM_PROMPT, build_prompt(kpis_doc)):
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+async def analyze_cached(kpis_doc: dict, http: aiohttp.ClientSession | None = None) -> str:
+    """
+    analyze_with_bedrock() behind an S3 cache. recaps/{puuid}/{year}/{hash}.md holds the
+    report for that exact prompt and recaps/{puuid}/{year}.md the latest one, so
+    unchanged KPIs skip Bedrock entirely. Docs without puuid/year aren't cached.
+    """
+    puuid, year = kpis_doc.get("puuid"), kpis_doc.get("year")
+    if not (S3_BUCKET and puuid and year):
+        return await analyze_with_bedrock(kpis_doc, http)
+
+    key = f"recaps/{puuid}/{year}/{_recap_hash(kpis_doc)}.md"
+    async with session.client("s3", region_name=AWS_REGION) as s3:
+        try:
+            obj = await s3.get_object(Bucket=S3_BUCKET, Key=key)
+            print(f"♻️ Cached report: s3://{S3_BUCKET}/{key}")
+            return (await obj["Body"].read()).decode("utf-8")
+        except s3.exceptions.NoSuchKey:
+            pass
+
+        report = await analyze_with_bedrock(kpis_doc, http)
+        if not report.startswith("{"):  # raw-response fallback: don't pin an unparsed reply
+            for k in (key, f"recaps/{puuid}/{year}.md"):
+                await s3.put_object(Bucket=S3_BUCKET, Key=k, Body=report.encode("utf-8"),
+                                    ContentType="text/markdown; charset=utf-8")
+    return report
+
+def analyze_with_bedrock_sync(kpis_doc: dict, cache: bool = False) -> str:
+    """Blocking wrapper for callers without an event loop (the CLI)."""
+    return asyncio.run(analyze_cached(kpis_doc) if cache else analyze_with_bedrock(kpis_doc))
+
+# -------------------------------
+# Bedrock Batch Inference (many players / years at once)
+# -------------------------------
+def _record_id(kpis_doc: dict, i: int) -> str:
+    if kpis_doc.get("puuid") and kpis_doc.get("year"):
+        return f"{kpis_doc['puuid']}_{kpis_doc['year']}"
+    return f"doc{i}"
+
+def _batch_record(record_id: str, kpis_doc: dict) -> dict:
+    # Batch jobs take the model's native (InvokeModel) body, not the Converse shape
+    return {
+        "recordId": record_id,
+        "modelInput": {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": 2000,
+            "stop_sequences": ["\n\nHuman:"],
+            "temperature": 0.5,
+            "top_p": 0.999,
+            "top_k": 250,
+            "system": SYSTEM_PROMPT,
+            "messages": [{"role": "user", "content": [{"type": "text", "text": build_prompt(kpis_doc)}]}],
+        },
+    }
+
+async def analyze_batch(kpis_docs: list[dict], cache: bool = False) -> dict:
+    """
+    Generate reports for many KPI docs with one Bedrock Batch Inference job.
+    Returns {recordId: markdown}, recordId being "{puuid}_{year}" (or "doc{i}").
+    Bedrock rejects jobs under BATCH_MIN_RECORDS, so small sets go on-demand instead
+    (BEDROCK_CONCURRENCY at a time). A failed record gets its error as JSON, like batch output.
+    """
+    ids = [_record_id(d, i) for i, d in enumerate(kpis_docs)]
+    if len(kpis_docs) < BATCH_MIN_RECORDS:
+        sem = asyncio.Semaphore(BEDROCK_CONCURRENCY)
+        analyze = analyze_cached if cache else analyze_with_bedrock
+
+        async def one(rid, d, http):
+            async with sem:
+                try:
+                    return await analyze(d, http)
+                except Exception as e:
+                    print(f"⚠️ {rid}: {e}", file=sys.stderr)
+                    return json.dumps({"error": str(e)}, indent=2)
+
+        async with aiohttp.ClientSession() as http:
+            reports = await asyncio.gather(*(one(rid, d, http) for rid, d in zip(ids, kpis_docs)))
+        return dict(zip(ids, reports))
+
+    if not (S3_BUCKET and BEDROCK_BATCH_ROLE_ARN and BEDROCK_BATCH_MODEL_ID):
+        raise RuntimeError("Batch mode needs S3_BUCKET, BEDROCK_BATCH_ROLE_ARN and a model id. Set them in secrets/.env")
+
+    job_name = f"rift-rewind-{int(time.time())}"
+    in_key = f"batch/{job_name}/in.jsonl"
+    out_prefix = f"batch/{job_name}/out/"
+    manifest = b"\n".join(orjson.dumps(_batch_record(rid, d)) for rid, d in zip(ids, kpis_docs))
+
+    async with session.client("s3", region_name=AWS_REGION) as s3, \
+               session.client("bedrock", region_name=AWS_REGION) as bedrock:
+        await s3.put_object(Bucket=S3_BUCKET, Key=in_key, Body=manifest,
+                            ContentType="application/jsonl")
+        job = await bedrock.create_model_invocation_job(
+            jobName=job_name,
+            roleArn=BEDROCK_BATCH_ROLE_ARN,
+            modelId=BEDROCK_BATCH_MODEL_ID,
+            inputDataConfig={"s3InputDataConfig": {"s3Uri": f"s3://{S3_BUCKET}/{in_key}"}},
+            outputDataConfig={"s3OutputDataConfig": {"s3Uri": f"s3://{S3_BUCKET}/{out_prefix}"}},
+        )
+        print(f"🧾 Submitted batch job {job_name} ({len(kpis_docs)} records)")
+
+        while True:
+            status = (await bedrock.get_model_invocation_job(jobIdentifier=job["jobArn"]))["status"]
+            if status in ("Completed", "PartiallyCompleted", "Failed", "Stopped", "Expired"):
+                break
+            await asyncio.sleep(BATCH_POLL_SECONDS)
+        if status not in ("Completed", "PartiallyCompleted"):
+            raise RuntimeError(f"Batch job {job_name} ended with status {status}")
+
+        # Outputs land under {out_prefix}{jobId}/in.jsonl.out
+        reports = {}
+        listing = await s3.list_objects_v2(Bucket=S3_BUCKET, Prefix=out_prefix)
+        for it in listing.get("Contents", []):
+            if not it["Key"].endswith(".jsonl.out"):
+                continue
+            obj = await s3.get_object(Bucket=S3_BUCKET, Key=it["Key"])
+            for line in (await obj["Body"].read()).splitlines():
+                rec = orjson.loads(line)
+                try:
+                    reports[rec["recordId"]] = rec["modelOutput"]["content"][0]["text"].strip()
+                except (KeyError, IndexError):
+                    reports[rec["recordId"]] = json.dumps(rec.get("error") or rec, indent=2)
+    return reports
+
 # -------------------------------
 # CLI
 # -------------------------------
@@ -196,8 +451,21 @@ def main():
     ap.add_argument("--file", help="Read KPIs from local JSON file instead of S3")
     ap.add_argument("--riot-id", help="Alternative: resolve PUUID from Riot ID Name#TAG")
     ap.add_argument("--region", help="Region for Riot ID resolve (e.g., na, euw, kr)")
+    ap.add_argument("--batch", nargs="+", metavar="FILE", help="Score many local KPI JSON files in one Bedrock batch job")
+    ap.add_argument("--no-cache", action="store_true", help="Always call Bedrock (skip the recaps/ report cache in S3)")
     args = ap.parse_args()
 
+    if args.batch:
+        docs = []
+        for path in args.batch:
+            with open(path, "r") as f:
+                docs.append(json.load(f))
+        reports = asyncio.run(analyze_batch(docs, cache=not args.no_cache))
+        for rid, report in reports.items():
+            print(f"\n===== COACH REPORT: {rid} =====\n")
+            print(report)
+        return
+
     # Load KPI JSON
     if args.file:
         with open(args.file, "r") as f:
@@ -217,10 +485,10 @@ def main():
         if not args.year:
             print("❌ Provide --year")
             sys.exit(1)
-        kpis_doc = load_kpis_from_s3(puuid, str(args.year))
+        kpis_doc = asyncio.run(load_kpis_from_s3(puuid, str(args.year)))
 
     # Ask Claude 3.5 for the coaching report
-    summary = analyze_with_bedrock(kpis_doc)
+    summary = analyze_with_bedrock_sync(kpis_doc, cache=not args.no_cache)
     print("\n===== COACH REPORT =====\n")
     print(summary)
 
@@ -3,18 +3,16 @@ import sys, os
 sys.path.append(os.path.join(os.path.dirname(__file__)))
 
 from imports import (
-    os, sys, io, time, json, gzip, random, asyncio,
+    os, sys, time, random, asyncio, argparse,
     Path, quote, datetime, timezone,
-    requests, aiohttp, boto3, load_dotenv,
-    ClientError, NoCredentialsError
+    orjson, gunzip, requests, aioboto3, boto3, load_dotenv,
 )
 from utils import (
     API_KEY, AWS_REGION, S3_BUCKET, DDB_TABLE, HEADERS,
-    s3, ddb,
-    s3_exists, put_json_gz,
     PLATFORM_BY_REGION, regional_from_platform,
-    riot_get_sync, get_puuid_from_riot_id, list_match_ids_year,
-    fetch_match_detail, fetch_timeline
+    get_puuid_from_riot_id, list_match_ids_year_async, riot_session,
+    fetch_match_detail, fetch_timeline, RiotLimiter,
+    ddb_index_item, flush_ddb_batch, DDB_BATCH_SIZE, gzip_spool, ndjson_spool, shard_matches
 )
 
 # =======================
@@ -22,6 +20,11 @@ from utils import (
 # =======================
 # Tune this based on how aggressive you want to be (8–12 is usually safe).
 CONCURRENCY = int(os.getenv("CONCURRENCY", "10"))
+# Parallel S3 PUTs; past ~16 the gains flatten out.
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "8"))
+
+# Per-year index of NDJSON match shards (match id -> shard file), next to the shards
+SHARD_MANIFEST = "shards.json.gz"
 
 # If True, we’ll also skip network fetch when a local JSON cache exists
 USE_LOCAL_CACHE = True
@@ -29,214 +32,307 @@ USE_LOCAL_CACHE = True
 # =======================
 # HELPERS
 # =======================
-def gzip_bytes(obj: dict) -> bytes:
-    b = io.BytesIO()
-    with gzip.GzipFile(fileobj=b, mode="wb") as gz:
-        gz.write(json.dumps(obj).encode("utf-8"))
-    return b.getvalue()
-
-def s3_exists(key: str) -> bool:
-    try:
-        s3.head_object(Bucket=S3_BUCKET, Key=key)
-        return True
-    except NoCredentialsError:
-        print("❌ No AWS credentials found. Run `aws configure` or set a profile.", file=sys.stderr)
-        sys.exit(1)
-    except ClientError as e:
-        code = e.response.get("Error", {}).get("Code")
-        status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
-        if code in ("404", "NoSuchKey") or status == 404:
-            return False
-        if status in (301, 400):
-            print("❌ S3 region or bucket mismatch. Verify AWS_REGION and bucket region.", file=sys.stderr)
-            raise
-        raise
-
-def put_json_gz(key: str, obj: dict):
-    s3.put_object(
-        Bucket=S3_BUCKET,
-        Key=key,
-        Body=gzip_bytes(obj),
-        ContentType="application/json",
-        ContentEncoding="gzip",
-    )
+def _load_json(path: Path):
+    return orjson.loads(path.read_bytes())
+
+def _load_json_gz(body: bytes):
+    return orjson.loads(gunzip(body))
+
+async def list_existing(s3c, prefix: str) -> set[str]:
+    """Basenames of every object under `prefix` (one paginated LIST instead of a HEAD per key)."""
+    names = set()
+    async for page in s3c.get_paginator("list_objects_v2").paginate(Bucket=S3_BUCKET, Prefix=prefix):
+        for it in page.get("Contents", []):
+            names.add(it["Key"].rsplit("/", 1)[-1])
+    return names
+
+# The spool only bounds memory while gzipping: aioboto3's upload_fileobj reads it back
+# into bytes for put_object (per part past the multipart threshold), so the body is not streamed.
+async def put_json_gz(s3c, key: str, obj: dict, sem: asyncio.Semaphore):
+    async with sem:
+        with gzip_spool(obj) as body:
+            await s3c.upload_fileobj(
+                body, S3_BUCKET, key,
+                ExtraArgs={"ContentType": "application/json", "ContentEncoding": "gzip"},
+            )
+
+async def put_ndjson_gz(s3c, key: str, objs: list, sem: asyncio.Semaphore):
+    async with sem:
+        with ndjson_spool(objs) as body:
+            await s3c.upload_fileobj(
+                body, S3_BUCKET, key,
+                ExtraArgs={"ContentType": "application/x-ndjson", "ContentEncoding": "gzip"},
+            )
+
+async def load_shard_manifest(s3c, key: str) -> dict:
+    """match id -> shard file name, for a year uploaded with --shard-size."""
+    obj = await s3c.get_object(Bucket=S3_BUCKET, Key=key)
+    return orjson.loads(gunzip(await obj["Body"].read()))
 
 # =======================
 # MAIN
 # =======================
-def main():
-    riot_id = input("Enter Riot ID (GameName#TAG): ").strip()
-    region  = input("Enter Region (na, euw, eune, kr, jp, oce, br, lan, las, sg, th, tw, vn, ph): ").strip().lower()
-    year_in = input(f"Year (default {datetime.now().year}): ").strip()
-    year    = int(year_in) if year_in else datetime.now().year
-
-    upload_matches   = input("Upload MATCH details to S3? (y/N): ").strip().lower() == "y"
-    upload_timelines = input("Upload TIMELINES to S3? (y/N): ").strip().lower() == "y"
-    write_ddb_index  = False
-    if DDB_TABLE:
-        write_ddb_index = input(f"Write DynamoDB index items to '{DDB_TABLE}'? (y/N): ").strip().lower() == "y"
-
-    platform = PLATFORM_BY_REGION.get(region)
-    if not platform:
-        print(f"❌ Unknown region '{region}'.", file=sys.stderr); return
-    regional = regional_from_platform(platform)
-
-    # Resolve PUUID (sync ok)
-    puuid = get_puuid_from_riot_id(regional, riot_id)
-    print(f"✅ PUUID: {puuid}")
+async def run_player(puuid: str, year: int, opts, regional: str, session, s3c, limiter: RiotLimiter, upload_sem):
+    tag = f"[{puuid[:8]}]"
 
-    # List IDs (sync ok)
-    print(f"⏳ Listing match IDs for {year}…")
-    match_ids = list_match_ids_year(regional, puuid, year)
-    total = len(match_ids)
-    print(f"✅ Found {total} matches in {year}")
+    # List IDs (pages share the run's session and rate limiter)
+    match_ids = await list_match_ids_year_async(session, regional, puuid, year, limiter)
+    print(f"{tag} ✅ Found {len(match_ids)} matches in {year}")
 
     # Save local IDs file
     out_dir = Path("data") / "raw" / puuid / str(year)
     out_dir.mkdir(parents=True, exist_ok=True)
-    (out_dir / "match_ids.json").write_text(json.dumps(match_ids, indent=2))
-    print(f"📂 Saved IDs → {out_dir/'match_ids.json'}")
+    (out_dir / "match_ids.json").write_bytes(orjson.dumps(match_ids))
+    print(f"{tag} 📂 Saved IDs → {out_dir/'match_ids.json'}")
 
     # Optional limit for testing
-    limit_in = input("Limit to first N matches (blank = all): ").strip()
-    if limit_in:
-        try:
-            n = int(limit_in)
-            match_ids = match_ids[:n]
-            print(f"⚡ Limiting to first {n} matches for this run")
-        except ValueError:
-            print("⚠️ Invalid number entered, using all matches")
-
-    if not (upload_matches or upload_timelines):
-        print("ℹ️ Skipping uploads (you chose No). Done.")
+    if opts.limit:
+        match_ids = match_ids[:opts.limit]
+        print(f"{tag} ⚡ Limiting to first {opts.limit} matches for this run")
+
+    if not (opts.upload_matches or opts.upload_timelines or opts.ddb_index):
         return
 
     # Local cache paths (used only if USE_LOCAL_CACHE=True)
     def local_match_path(mid): return out_dir / f"{mid}.json"
     def local_tl_path(mid):    return out_dir / f"{mid}.timeline.json"
 
-    async def run_async():
-        sem = asyncio.Semaphore(CONCURRENCY)
-        async with aiohttp.ClientSession() as session:
+    # What's already on S3 — one listing per prefix
+    have_matches = await list_existing(s3c, f"matches/{puuid}/{year}/")
+    have_tl = await list_existing(s3c, f"timelines/{puuid}/{year}/") if opts.upload_timelines else set()
+    # Matches already stored inside NDJSON shards (--shard-size runs)
+    manifest_key = f"matches/{puuid}/{year}/{SHARD_MANIFEST}"
+    sharded = await load_shard_manifest(s3c, manifest_key) if SHARD_MANIFEST in have_matches else {}
 
-            # 1) FETCH MATCH DETAILS (only for those we need)
-            need_details = []
-            for mid in match_ids:
-                if not upload_matches and not write_ddb_index:
-                    continue
-                s3_key_match = f"matches/{puuid}/{year}/{mid}.json.gz"
-                if s3_exists(s3_key_match):
-                    continue
-                if USE_LOCAL_CACHE and local_match_path(mid).exists():
+    # What's in the local cache — one directory scan instead of a stat per match
+    cached_ids, cached_tl = set(), set()
+    if USE_LOCAL_CACHE:
+        with os.scandir(out_dir) as entries:
+            for e in entries:
+                if e.name.endswith(".timeline.json"):
+                    cached_tl.add(e.name.removesuffix(".timeline.json"))
+                elif e.name.endswith(".json") and e.name != "match_ids.json":
+                    cached_ids.add(e.name.removesuffix(".json"))
+
+    # 1) FETCH MATCH DETAILS (only for those we need)
+    need_details = []
+    for mid in match_ids:
+        if not opts.upload_matches and not opts.ddb_index:
+            continue
+        if f"{mid}.json.gz" in have_matches or mid in sharded:
+            continue
+        if mid in cached_ids:
+            continue
+        need_details.append(mid)
+
+    print(f"{tag} 🧩 Need {len(need_details)} new match detail fetches")
+
+    match_detail_by_id = {}
+    # For DDB indexing we may still require details even if matches already exist in S3.
+    # Load what the local cache has on worker threads to avoid extra network.
+    if opts.upload_matches or opts.ddb_index:
+        cached = [mid for mid in match_ids if mid in cached_ids]
+        loaded = await asyncio.gather(
+            *(asyncio.to_thread(_load_json, local_match_path(mid)) for mid in cached),
+            return_exceptions=True,
+        )
+        for mid, mj in zip(cached, loaded):
+            if not isinstance(mj, Exception):
+                match_detail_by_id[mid] = mj
+
+    tasks = [fetch_match_detail(session, regional, mid, limiter) for mid in need_details]
+    done = 0
+    for coro in asyncio.as_completed(tasks):
+        try:
+            mj = await coro
+            mid = mj.get("metadata", {}).get("matchId")
+            if mid:
+                match_detail_by_id[mid] = mj
+                if USE_LOCAL_CACHE:
+                    local_match_path(mid).write_bytes(orjson.dumps(mj))
+            done += 1
+            if done and done % 25 == 0:
+                print(f"{tag}    details fetched: {done}/{len(need_details)}")
+        except Exception as e:
+            print(tag, "detail skip:", e)
+
+    # 2) UPLOAD MATCH DETAILS (S3)
+    if opts.upload_matches:
+        # Skip if neither local nor fetched, or already on S3
+        new = [mid for mid in match_ids
+               if match_detail_by_id.get(mid) and f"{mid}.json.gz" not in have_matches and mid not in sharded]
+        if opts.shard_size:
+            # Shards are write-once: new matches go past the highest shard number, the manifest is rewritten
+            first = 1 + max((int(n[len("shard-"):].split(".", 1)[0]) for n in have_matches if n.startswith("shard-")),
+                            default=-1)
+            parts = [new[i:i + opts.shard_size] for i in range(0, len(new), opts.shard_size)]
+            names = [f"shard-{first + n:04d}.ndjson.gz" for n in range(len(parts))]
+            uploads = [put_ndjson_gz(s3c, f"matches/{puuid}/{year}/{name}",
+                                     [match_detail_by_id[mid] for mid in part], upload_sem)
+                       for name, part in zip(names, parts)]
+        else:
+            parts, names = [[mid] for mid in new], [f"{mid}.json.gz" for mid in new]
+            uploads = [put_json_gz(s3c, f"matches/{puuid}/{year}/{mid}.json.gz", match_detail_by_id[mid], upload_sem)
+                       for mid in new]
+        results = await asyncio.gather(*uploads, return_exceptions=True)
+        uploaded = 0
+        for name, part, e in zip(names, parts, results):
+            if isinstance(e, Exception):
+                print(tag, "upload skip:", e)
+                continue
+            have_matches.add(name)
+            uploaded += len(part)
+            if opts.shard_size:
+                sharded.update(dict.fromkeys(part, name))
+        if opts.shard_size and uploaded:
+            await put_json_gz(s3c, manifest_key, sharded, upload_sem)
+        print(f"{tag} ☁️  Uploaded {uploaded} match detail objects" +
+              (f" in {len(parts)} shard(s)" if opts.shard_size else ""))
+
+    # 3) FETCH & UPLOAD TIMELINES (only if requested and not in cache/S3)
+    if opts.upload_timelines:
+        need_tl = []
+        for mid in match_ids:
+            if f"{mid}.json.gz" in have_tl:
+                continue
+            if mid in cached_tl:
+                continue
+            need_tl.append(mid)
+        print(f"{tag} 🧭 Need {len(need_tl)} new timelines")
+
+        tl_tasks = [fetch_timeline(session, regional, mid, limiter) for mid in need_tl]
+        tl_uploads = []
+        done = 0
+        for coro in asyncio.as_completed(tl_tasks):
+            try:
+                tl = await coro
+                mid = tl.get("metadata", {}).get("matchId")
+                if not mid:
                     continue
-                need_details.append(mid)
-
-            print(f"🧩 Need {len(need_details)} new match detail fetches")
-
-            match_detail_by_id = {}
-            # For DDB indexing we may still require details even if matches already exist in S3.
-            # Let's also track details we can load from local cache to avoid extra network.
-            for mid in match_ids:
-                if (USE_LOCAL_CACHE and local_match_path(mid).exists()) and (upload_matches or write_ddb_index):
-                    try:
-                        mj = json.loads(local_match_path(mid).read_text())
-                        match_detail_by_id[mid] = mj
-                    except Exception:
-                        pass
-
-            tasks = [fetch_match_detail(session, regional, mid, sem) for mid in need_details]
-            done = 0
-            for coro in asyncio.as_completed(tasks):
-                try:
-                    mj = await coro
-                    mid = mj.get("metadata", {}).get("matchId")
-                    if mid:
-                        match_detail_by_id[mid] = mj
-                        if USE_LOCAL_CACHE:
-                            local_match_path(mid).write_text(json.dumps(mj))
-                    done += 1
-                    if done and done % 25 == 0:
-                        print(f"   details fetched: {done}/{len(need_details)}")
-                except Exception as e:
-                    print("detail skip:", e)
-
-            # 2) UPLOAD MATCH DETAILS (S3)
-            if upload_matches:
-                uploaded = 0
-                for mid in match_ids:
-                    mj = match_detail_by_id.get(mid)
-                    if not mj:
-                        # Could be already on S3; if yes, skip
-                        if s3_exists(f"matches/{puuid}/{year}/{mid}.json.gz"):
-                            continue
-                        # If neither local nor fetched, skip
-                        continue
-                    key = f"matches/{puuid}/{year}/{mid}.json.gz"
-                    if not s3_exists(key):
-                        put_json_gz(key, mj)
-                        uploaded += 1
-                print(f"☁️  Uploaded {uploaded} match detail objects")
-
-            # 3) FETCH & UPLOAD TIMELINES (only if requested and not in cache/S3)
-            if upload_timelines:
-                need_tl = []
-                for mid in match_ids:
-                    key = f"timelines/{puuid}/{year}/{mid}.json.gz"
-                    if s3_exists(key):
-                        continue
-                    if USE_LOCAL_CACHE and local_tl_path(mid).exists():
-                        continue
-                    need_tl.append(mid)
-                print(f"🧭 Need {len(need_tl)} new timelines")
-
-                tl_tasks = [fetch_timeline(session, regional, mid, sem) for mid in need_tl]
-                done = 0
-                for coro in asyncio.as_completed(tl_tasks):
-                    try:
-                        tl = await coro
-                        mid = tl.get("metadata", {}).get("matchId")
-                        if not mid:
-                            continue
-                        if USE_LOCAL_CACHE:
-                            local_tl_path(mid).write_text(json.dumps(tl))
-                        key = f"timelines/{puuid}/{year}/{mid}.json.gz"
-                        if not s3_exists(key):
-                            put_json_gz(key, tl)
-                        done += 1
-                        if done and done % 20 == 0:
-                            print(f"   timelines processed: {done}/{len(need_tl)}")
-                    except Exception as e:
-                        print("timeline skip:", e)
-
-            # 4) DDB INDEX (optional) — only for matches we have a match JSON for
-            if write_ddb_index:
-                indexed = 0
-                for mid in match_ids:
-                    key_m  = f"matches/{puuid}/{year}/{mid}.json.gz" if upload_matches else None
-                    key_tl = f"timelines/{puuid}/{year}/{mid}.json.gz" if upload_timelines else None
-                    mj = match_detail_by_id.get(mid)
-                    if not mj:
-                        # If we didn't fetch this run, try to use local cache
-                        if USE_LOCAL_CACHE and local_match_path(mid).exists():
-                            try:
-                                mj = json.loads(local_match_path(mid).read_text())
-                            except Exception:
-                                pass
-                    if mj:
-                        try:
-                            put_index_ddb(puuid, year, mj, key_m, key_tl)
-                            indexed += 1
-                        except Exception as e:
-                            print("ddb skip:", e)
-                print(f"🗂️  Wrote {indexed} index items to DynamoDB")
-
-    asyncio.run(run_async())
+                if USE_LOCAL_CACHE:
+                    local_tl_path(mid).write_bytes(orjson.dumps(tl))
+                if f"{mid}.json.gz" not in have_tl:
+                    # Upload in the background while the next timelines download
+                    tl_uploads.append(asyncio.create_task(
+                        put_json_gz(s3c, f"timelines/{puuid}/{year}/{mid}.json.gz", tl, upload_sem)))
+                    have_tl.add(f"{mid}.json.gz")
+                done += 1
+                if done and done % 20 == 0:
+                    print(f"{tag}    timelines processed: {done}/{len(need_tl)}")
+            except Exception as e:
+                print(tag, "timeline skip:", e)
+        for e in await asyncio.gather(*tl_uploads, return_exceptions=True):
+            if isinstance(e, Exception):
+                print(tag, "timeline upload skip:", e)
+
+    # 4) DDB INDEX (optional) — only for matches we have a match JSON for
+    if opts.ddb_index:
+        items = []
+        for mid in match_ids:
+            if mid in sharded:
+                key_m = f"matches/{puuid}/{year}/{sharded[mid]}"  # readers pick the match out by id
+            else:
+                key_m = f"matches/{puuid}/{year}/{mid}.json.gz" if opts.upload_matches else None
+            key_tl = f"timelines/{puuid}/{year}/{mid}.json.gz" if opts.upload_timelines else None
+            # fetched this run or loaded from the local cache above
+            mj = match_detail_by_id.get(mid)
+            if mj:
+                items.append(ddb_index_item(puuid, year, mj, key_m, key_tl))
+
+        # On S3 but neither cached nor fetched: re-index from the stored objects
+        on_s3 = [mid for mid in match_ids if mid not in match_detail_by_id and f"{mid}.json.gz" in have_matches]
+        in_shards = {}  # shard file -> its matches still to index (one GET per shard)
+        for mid in match_ids:
+            if mid not in match_detail_by_id and mid in sharded:
+                in_shards.setdefault(sharded[mid], []).append(mid)
+
+        def tl_key(mid):
+            return f"timelines/{puuid}/{year}/{mid}.json.gz" if opts.upload_timelines else None
+
+        async def get_body(key):
+            async with upload_sem:
+                obj = await s3c.get_object(Bucket=S3_BUCKET, Key=key)
+                return await obj["Body"].read()
+
+        async def index_from_s3(mid):
+            key_m = f"matches/{puuid}/{year}/{mid}.json.gz"
+            mj = await asyncio.to_thread(_load_json_gz, await get_body(key_m))
+            return [ddb_index_item(puuid, year, mj, key_m, tl_key(mid))]
+
+        async def index_from_shard(name, mids):
+            key_m = f"matches/{puuid}/{year}/{name}"
+            docs = await asyncio.to_thread(shard_matches, await get_body(key_m))
+            return [ddb_index_item(puuid, year, docs[mid], key_m, tl_key(mid)) for mid in mids if mid in docs]
+
+        for its in await asyncio.gather(*(index_from_s3(mid) for mid in on_s3),
+                                        *(index_from_shard(n, mids) for n, mids in in_shards.items()),
+                                        return_exceptions=True):
+            if isinstance(its, Exception):
+                print(tag, "reindex skip:", its)
+            else:
+                items.extend(its)
+        indexed = 0
+        for i in range(0, len(items), DDB_BATCH_SIZE):
+            try:
+                indexed += await asyncio.to_thread(flush_ddb_batch, items[i:i + DDB_BATCH_SIZE])
+            except Exception as e:
+                print(tag, "ddb skip:", e)
+        print(f"{tag} 🗂️  Wrote {indexed} index items to DynamoDB")
+
+async def run_all(puuids: list[str], year: int, opts, regional: str):
+    # One limiter, HTTP pool and S3 client shared by every player (same API key, same bucket)
+    limiter = RiotLimiter()
+    upload_sem = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+    async with riot_session(limit_per_host=CONCURRENCY) as session, \
+               aioboto3.Session().client("s3", region_name=AWS_REGION) as s3c:
+        results = await asyncio.gather(
+            *(run_player(p, year, opts, regional, session, s3c, limiter, upload_sem) for p in puuids),
+            return_exceptions=True,
+        )
+    for puuid, res in zip(puuids, results):
+        if isinstance(res, Exception):
+            print(f"❌ [{puuid[:8]}] failed: {res}", file=sys.stderr)
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Fetch a year of Riot matches for one or more players and stage them in S3.")
+    ap.add_argument("--region", required=True, help="na, euw, eune, kr, jp, oce, br, lan, las, sg, th, tw, vn, ph")
+    who = ap.add_mutually_exclusive_group(required=True)
+    who.add_argument("--puuids", nargs="+", help="Player PUUIDs")
+    who.add_argument("--riot-ids", nargs="+", metavar="NAME#TAG", help="Resolve PUUIDs from Riot IDs")
+    ap.add_argument("--year", type=int, default=datetime.now().year, help="Season year (default: current)")
+    ap.add_argument("--limit", type=int, default=0, help="Only process the first N matches per player")
+    ap.add_argument("--upload-matches", action="store_true", help="Upload MATCH details to S3")
+    ap.add_argument("--shard-size", type=int, default=0, metavar="N",
+                    help="Upload matches as gzipped NDJSON shards of up to N matches (default: one object per match)")
+    ap.add_argument("--upload-timelines", action="store_true", help="Upload TIMELINES to S3")
+    ap.add_argument("--ddb-index", action="store_true", help="Write DynamoDB index items (needs DDB_TABLE)")
+    return ap.parse_args()
+
+def main():
+    opts = parse_args()
+    if opts.ddb_index and not DDB_TABLE:
+        print("⚠️ --ddb-index needs DDB_TABLE in secrets/.env; skipping index writes", file=sys.stderr)
+        opts.ddb_index = False
+
+    platform = PLATFORM_BY_REGION.get(opts.region) or PLATFORM_BY_REGION.get(opts.region.lower())
+    if not platform:
+        print(f"❌ Unknown region '{opts.region}'.", file=sys.stderr); sys.exit(1)
+    regional = regional_from_platform(platform)
+
+    puuids = opts.puuids or []
+    for riot_id in opts.riot_ids or []:
+        puuid = get_puuid_from_riot_id(regional, riot_id)
+        print(f"✅ {riot_id} → PUUID: {puuid}")
+        puuids.append(puuid)
+
+    print(f"⏳ Processing {len(puuids)} player(s) for {opts.year}…")
+    asyncio.run(run_all(puuids, opts.year, opts, regional))
 
     print("🎉 Done.")
-    if upload_matches:
-        print(f"   → s3://{S3_BUCKET}/matches/{puuid}/{year}/...")
-    if upload_timelines:
-        print(f"   → s3://{S3_BUCKET}/timelines/{puuid}/{year}/...")
+    if opts.upload_matches:
+        print(f"   → s3://{S3_BUCKET}/matches/<puuid>/{opts.year}/...")
+    if opts.upload_timelines:
+        print(f"   → s3://{S3_BUCKET}/timelines/<puuid>/{opts.year}/...")
 
 if __name__ == "__main__":
     main()
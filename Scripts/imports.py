@@ -8,16 +8,39 @@ import time
 import json
 import gzip
 import random
+import argparse
 import asyncio
+import contextlib
+import tempfile
 from pathlib import Path
 from urllib.parse import quote
+from email.utils import parsedate_to_datetime
 from datetime import datetime, timezone
-from collections import Counter
+from collections import Counter, deque
+from operator import itemgetter
+from functools import lru_cache
+from itertools import chain
+from types import MappingProxyType
+from concurrent.futures import Future, ThreadPoolExecutor
 
 # ----- Third Party -----
+import orjson
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import aiohttp
+import aioboto3
 import boto3
 from dotenv import load_dotenv
+from botocore.config import Config
+try:
+    from isal.igzip import decompress as gunzip  # ISA-L inflate, 2-3x stdlib zlib
+except ImportError:
+    from gzip import decompress as gunzip
+try:
+    import ijson  # optional: streaming match parse (kpis_basic --streaming)
+except ImportError:
+    ijson = None
 from botocore.exceptions import ClientError, NoCredentialsError
 
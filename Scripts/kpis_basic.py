@@ -2,11 +2,9 @@
 import sys, os
 sys.path.append(os.path.join(os.path.dirname(__file__)))
 
-from imports import os, json, io, gzip, boto3
-from utils import S3_BUCKET, DDB_TABLE
-
-s3  = boto3.client("s3")
-ddb = boto3.client("dynamodb")
+from imports import os, json, io, gzip, argparse, asyncio, orjson, np, gunzip, ijson, Path, itemgetter, aioboto3, Config, ClientError
+# reuse the process-wide clients from utils (one per service, pinned to AWS_REGION)
+from utils import AWS_REGION, S3_BUCKET, DDB_TABLE, s3, ddb, put_json_gz, put_json_gz_async, shard_matches
 
 
 ROLE_MAP = {
@@ -25,6 +23,7 @@ QUEUE_BUCKET = {
     "NORMALS":         {400, 430, 490} # Blind, Draft, Normal Draft (adjust as you like)
     # ARAM=450 not included in splits by default
 }
+QID_TO_BUCKET = {qid: bucket for bucket, qids in QUEUE_BUCKET.items() for qid in qids}
 
 # Treat these item ids as "ignore" when counting favorites (trinkets/boots/consumables).
 # You can refine using Data Dragon later; for now we skip trinkets and common consumables.
@@ -33,70 +32,106 @@ CONSUMABLES = {2003, 2010, 2031, 2033, 2138, 2139, 2140}
 BOOTS = {1001, 3006, 3009, 3020, 3047, 3111, 3117}
 IGNORE_ITEMS = TRINKETS | CONSUMABLES  # (we will keep boots in favorites by default)
 
+# Numeric row fields _aggregate reduces; copied once into column arrays (missing -> 0)
+NUMERIC_KEYS = (
+    "win", "time_played_sec",
+    "kill_participation", "damage_share", "cs_per_min", "vision_pm", "objective_contrib",
+    "gold_per_min", "dmg_per_min", "dmg_taken_pm",
+    "turret_kills", "dragons_killed", "barons_killed", "heralds_killed", "grubs_killed", "objective_damage",
+    "fb_involved", "fb_self",
+    "phys_to_champs", "magic_to_champs", "true_to_champs", "flash_casts",
+    "team_first_blood", "team_first_tower", "team_first_dragon", "team_first_baron", "team_first_herald",
+)
+
+
+# Legacy lane/role fallback, flattened into one (lane, role-hint) table at import.
+LANE_ALIAS = {"TOP": "TOP", "JUNGLE": "JUNGLE", "MIDDLE": "MIDDLE", "MID": "MIDDLE",
+              "BOTTOM": "BOTTOM", "BOT": "BOTTOM", "ADC": "BOTTOM"}
+ROLE_HINT  = {"DUO_SUPPORT": "SUPPORT", "SUPPORT": "SUPPORT", "DUO_CARRY": "BOTTOM", "CARRY": "BOTTOM"}
+LANE_ROLE_MAP = {
+    (lane, hint): ("SUPPORT" if lane == "BOTTOM" and hint == "SUPPORT" else lane or hint or "UNKNOWN")
+    for lane in {*LANE_ALIAS.values(), ""}
+    for hint in {*ROLE_HINT.values(), ""}
+}
+
 
 def infer_role(me: dict, info: dict) -> str:
     """
     Prefer teamPosition. If blank, infer from lane/role.
     Special-case ARAM (queueId=450).
     """
-    q = info.get("queueId")
-    if q == 450:
+    if info.get("queueId") == 450:
         return "ARAM"  # label ARAM separately if you want
 
-    # 1) Use teamPosition if present
-    tp = (me.get("teamPosition") or "").upper()
+    tp = me.get("teamPosition")
     if tp:
-        return ROLE_MAP.get(tp, "UNKNOWN")
-
-    # 2) Try older lane/role fields
-    lane = (me.get("lane") or "").upper()
-    role = (me.get("role") or "").upper()
-
-    # Map obvious lanes first
-    if lane in ("TOP", "MIDDLE", "MID", "JUNGLE", "BOTTOM", "BOT", "ADC"):
-        if lane == "MID": lane = "MIDDLE"
-        if lane in ("BOT", "ADC"): lane = "BOTTOM"
-
-        if lane == "BOTTOM":
-            # Disambiguate ADC vs Support by 'role'
-            if role in ("DUO_SUPPORT", "SUPPORT"):
-                return "SUPPORT"
-            elif role in ("DUO_CARRY", "CARRY", "SOLO", "DUO", ""):
-                return "BOTTOM"
-            else:
-                return "BOTTOM"
-        if lane == "MIDDLE":
-            return "MIDDLE"
-        return lane
-
-    # 3) If lane is unknown but role hints support/adc
-    if role in ("DUO_SUPPORT", "SUPPORT"):
-        return "SUPPORT"
-    if role in ("DUO_CARRY", "CARRY"):
-        return "BOTTOM"
-
-    return "UNKNOWN"
+        return ROLE_MAP.get(tp.upper(), "UNKNOWN")
+
+    # known lane wins (bottom split ADC/support by role); else the role alone hints support/adc
+    lane = LANE_ALIAS.get((me.get("lane") or "").upper(), "")
+    hint = ROLE_HINT.get((me.get("role") or "").upper(), "")
+    return LANE_ROLE_MAP[lane, hint]
 
 def _gunzip_to_json(body_bytes: bytes):
-    import gzip, io, json
-    with gzip.GzipFile(fileobj=io.BytesIO(body_bytes), mode="rb") as gz:
-        return json.loads(gz.read())
+    return orjson.loads(gunzip(body_bytes))
+
+# Everything _features_from_match / infer_role read from a participant; the rest is dropped while streaming
+PARTICIPANT_FIELDS = (
+    "puuid", "teamId", "win", "championName", "teamPosition", "lane", "role", "timePlayed",
+    "kills", "deaths", "assists", "goldEarned", "totalMinionsKilled", "neutralMinionsKilled", "visionScore",
+    "totalDamageDealtToChampions", "physicalDamageDealtToChampions", "magicDamageDealtToChampions",
+    "trueDamageDealtToChampions", "totalDamageTaken", "totalHealsOnTeammates", "totalDamageShieldedOnTeammates",
+    "damageDealtToObjectives", "turretKills", "dragonKills", "baronKills", "riftHeraldKills",
+    "firstBloodKill", "firstBloodAssist", "visionWardsBoughtInGame", "wardsKilled",
+    "doubleKills", "tripleKills", "quadraKills", "pentaKills",
+    "spell1Id", "spell2Id", "summoner1Casts", "summoner2Casts",
+    "riotIdGameName", "summonerName", *(f"item{i}" for i in range(7)),
+)
+CHALLENGE_FIELDS = ("dragonTakedowns", "baronTakedowns", "riftHeraldTakedowns", "soloKills",
+                    "voidgrubKills", "voidGrubKills", "voidMonstersKilled")
+INFO_FIELDS = {"info.gameCreation", "info.gameDuration", "info.queueId", "info.gameVersion"}
+
+def _gunzip_stream_slim(body_bytes: bytes) -> dict:
+    """
+    Inflate + parse incrementally with ijson, keeping only the fields above.
+    Only one full participant dict is alive at a time; output feeds _features_from_match unchanged.
+    """
+    info = {"participants": [], "teams": []}
+    match = {"metadata": {}, "info": info}
+    builder, until = None, None
+    with gzip.GzipFile(fileobj=io.BytesIO(body_bytes)) as f:
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if builder is not None:
+                builder.event(event, value)
+                if prefix == until and event in ("end_map", "end_array"):
+                    if until == "info.teams":
+                        info["teams"] = builder.value
+                    else:
+                        p = builder.value
+                        slim = {k: p[k] for k in PARTICIPANT_FIELDS if k in p}
+                        ch = p.get("challenges") or {}
+                        slim["challenges"] = {k: ch[k] for k in CHALLENGE_FIELDS if k in ch}
+                        info["participants"].append(slim)
+                    builder = None
+            elif prefix == "info.participants.item" and event == "start_map" \
+                    or prefix == "info.teams" and event == "start_array":
+                builder, until = ijson.ObjectBuilder(), prefix
+                builder.event(event, value)
+            elif prefix in INFO_FIELDS:
+                info[prefix[5:]] = value
+            elif prefix == "metadata.matchId":
+                match["metadata"]["matchId"] = value
+    return match
 
 def _query_matches(puuid: str, year: str):
-    resp = ddb.query(
+    # only the two attributes we read: smaller pages, fewer round-trips
+    pages = ddb.get_paginator("query").paginate(
         TableName=DDB_TABLE,
         KeyConditionExpression="pk = :pk AND begins_with(sk, :yr)",
-        ExpressionAttributeValues={":pk": {"S": puuid}, ":yr": {"S": f"{year}#"}}
+        ExpressionAttributeValues={":pk": {"S": puuid}, ":yr": {"S": f"{year}#"}},
+        ProjectionExpression="sk, s3_key_match",
     )
-    items = resp.get("Items", [])
-    while "LastEvaluatedKey" in resp:
-        resp = ddb.query(
-            TableName=DDB_TABLE,
-            KeyConditionExpression="pk = :pk AND begins_with(sk, :yr)",
-            ExpressionAttributeValues={":pk": {"S": puuid}, ":yr": {"S": f"{year}#"}},
-            ExclusiveStartKey=resp["LastEvaluatedKey"],
-        )
-        items.extend(resp.get("Items", []))
+    items = [it for page in pages for it in page.get("Items", [])]
     out = []
     for it in items:
         sk = it["sk"]["S"]
@@ -105,29 +140,118 @@ def _query_matches(puuid: str, year: str):
         out.append((mid, key))
     return out
 
+FETCH_CONCURRENCY = 64  # GETs in flight on the event loop
+# Finished matches never change, so raw .json.gz bodies are kept on disk across runs
+CACHE_DIR = Path.home() / ".cache" / "rift_rewind"
+
+def _cache_put(p: Path, body: bytes):
+    tmp = p.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        tmp.write_bytes(body)
+        tmp.replace(p)  # atomic: a crashed run never leaves a truncated body behind
+    except OSError:
+        pass  # best-effort: a missing, read-only or full cache dir must not cost a match
+
+async def _get_body(s3a, key: str, use_cache: bool) -> bytes:
+    p = CACHE_DIR / key.replace("/", "_") if use_cache else None
+    if p and p.exists():
+        return p.read_bytes()
+    obj = await s3a.get_object(Bucket=S3_BUCKET, Key=key)
+    body = await obj["Body"].read()
+    if p: _cache_put(p, body)
+    return body
+
+async def _load_rows(match_refs, puuid: str, use_cache: bool = True, streaming: bool = False) -> list:
+    """
+    GET + parse every match on one event loop thread. Parsing a body overlaps the
+    other GETs still in flight. Returns a feature row (None, or the exception) per ref, in order.
+    """
+    sem = asyncio.Semaphore(FETCH_CONCURRENCY)
+    if use_cache:
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            pass  # uncacheable: _cache_put skips its writes
+    parse = _gunzip_stream_slim if streaming else _gunzip_to_json
+
+    shards = {}  # NDJSON shard key -> task parsing it into {match id: match}, one GET per shard
+
+    async def shard(key):
+        async with sem:
+            body = await _get_body(s3a, key, use_cache)
+        return shard_matches(body)
+
+    async def one(mid, key):
+        if key.endswith(".ndjson.gz"):  # fetch_riot --shard-size
+            if key not in shards:
+                shards[key] = asyncio.ensure_future(shard(key))
+            return _features_from_match((await shards[key])[mid], puuid)
+        async with sem:
+            body = await _get_body(s3a, key, use_cache)
+        return _features_from_match(parse(body), puuid)
+
+    cfg = Config(max_pool_connections=FETCH_CONCURRENCY)
+    async with aioboto3.Session().client("s3", region_name=AWS_REGION, config=cfg) as s3a:
+        return await asyncio.gather(*(one(mid, key) for mid, key in match_refs), return_exceptions=True)
+
 def _safe_div(n, d): return (n / d) if d else 0.0
 
+# Participant counters copied verbatim into the feature row (row name -> Riot key)
+ME_COPY = {
+    "kills": "kills", "deaths": "deaths", "assists": "assists",
+    "vision_wards": "visionWardsBoughtInGame", "wards_killed": "wardsKilled",
+    "double_kills": "doubleKills", "triple_kills": "tripleKills",
+    "quadra_kills": "quadraKills", "penta_kills": "pentaKills",
+    "phys_to_champs": "physicalDamageDealtToChampions",
+    "magic_to_champs": "magicDamageDealtToChampions",
+    "true_to_champs": "trueDamageDealtToChampions",
+    "turret_kills": "turretKills",
+    "dragons_killed": "dragonKills", "barons_killed": "baronKills", "heralds_killed": "riftHeraldKills",
+    "objective_damage": "damageDealtToObjectives",
+}
+ITEM_SLOTS = tuple(f"item{i}" for i in range(7))  # item6 is trinket
+# Every participant counter _features_from_match reads, 0 when Riot omits it
+ME_ZERO = dict.fromkeys((
+    *ME_COPY.values(), *ITEM_SLOTS,
+    "goldEarned", "visionScore", "totalMinionsKilled", "neutralMinionsKilled",
+    "totalDamageDealtToChampions", "totalDamageTaken", "totalHealsOnTeammates", "totalDamageShieldedOnTeammates",
+    "summoner1Casts", "summoner2Casts",
+), 0)
+_copy_me  = itemgetter(*ME_COPY.values())
+_item_ids = itemgetter(*ITEM_SLOTS)
+
 def _features_from_match(match_json: dict, puuid: str):
     info = match_json.get("info", {})
     game_creation_ms = info.get("gameCreation")  # for dating a match later
 
-    parts = info.get("participants", [])
-    me = next((p for p in parts if p.get("puuid") == puuid), None)
+    # index participants by puuid and team in one pass
+    by_puuid, by_team = {}, {}
+    for p in info.get("participants", ()):
+        pu = p.get("puuid")
+        if pu: by_puuid[pu] = p
+        by_team.setdefault(p.get("teamId"), []).append(p)
+    me = by_puuid.get(puuid)
     if not me: return None
+    m = {**ME_ZERO, **me}  # one C-level merge; fixed-name counters below are plain subscripts
 
     mins = (info.get("gameDuration") or me.get("timePlayed", 0)) / 60.0 or 0.0001
     team_id = me.get("teamId")
-    team = [p for p in parts if p.get("teamId") == team_id]
-    team_kills = sum(p.get("kills", 0) for p in team)
-    team_dmg   = sum(p.get("totalDamageDealtToChampions", 0) for p in team)
+    team = by_team[team_id]
+
+    # one pass over the team for kills/damage sums and objective takedown maxima
+    team_kills = team_dmg = team_drag = team_baron = team_her = 0
+    for p in team:
+        team_kills += p.get("kills", 0)
+        team_dmg   += p.get("totalDamageDealtToChampions", 0)
+        pc = p.get("challenges") or {}
+        team_drag  = max(team_drag,  int(pc.get("dragonTakedowns", 0)))
+        team_baron = max(team_baron, int(pc.get("baronTakedowns", 0)))
+        team_her   = max(team_her,   int(pc.get("riftHeraldTakedowns", 0)))
 
     ch = me.get("challenges") or {}
     my_obj = int(ch.get("dragonTakedowns", 0)) + int(ch.get("baronTakedowns", 0)) + int(ch.get("riftHeraldTakedowns", 0))
-    team_drag = max(int(p.get("challenges", {}).get("dragonTakedowns", 0)) for p in team) if team else 0
-    team_baron= max(int(p.get("challenges", {}).get("baronTakedowns", 0)) for p in team) if team else 0
-    team_her  = max(int(p.get("challenges", {}).get("riftHeraldTakedowns", 0)) for p in team) if team else 0
     team_obj_total = team_drag + team_baron + team_her
-    cs = me.get("totalMinionsKilled", 0) + me.get("neutralMinionsKilled", 0)
+    cs = m["totalMinionsKilled"] + m["neutralMinionsKilled"]
 
     # smarter role inference (you already have infer_role defined earlier)
     norm_role = infer_role(me, info)
@@ -149,22 +273,17 @@ def _features_from_match(match_json: dict, puuid: str):
                       for p in team if p.get("puuid")}
 
     # end-of-game items (we'll count favorites/best/worst based on final build)
-    items = [me.get(f"item{i}", 0) for i in range(7)]  # item6 is trinket
-    items = [i for i in items if i and i not in IGNORE_ITEMS]  # keep boots by default
+    items = [i for i in _item_ids(m) if i and i not in IGNORE_ITEMS]  # keep boots by default
 
     # spells & casts
     spell1, spell2 = me.get("spell1Id"), me.get("spell2Id")
-    s1_casts, s2_casts = me.get("summoner1Casts", 0), me.get("summoner2Casts", 0)
+    s1_casts, s2_casts = m["summoner1Casts"], m["summoner2Casts"]
     flash_casts = 0
     if spell1 == 4: flash_casts += s1_casts
     if spell2 == 4: flash_casts += s2_casts
 
-    # objective kills credited to player
-    p_dragons = me.get("dragonKills", 0)
-    p_barons  = me.get("baronKills", 0)
-    p_heralds = me.get("riftHeraldKills", 0)
     # "void grubs" field is not stable; try a few likely keys
-    p_grubs   = ch.get("voidgrubKills", 0) or ch.get("voidGrubKills", 0) or ch.get("voidMonstersKilled", 0)
+    p_grubs = ch.get("voidgrubKills", 0) or ch.get("voidGrubKills", 0) or ch.get("voidMonstersKilled", 0)
 
     return {
         "match_id": match_json.get("metadata", {}).get("matchId"),
@@ -177,44 +296,25 @@ def _features_from_match(match_json: dict, puuid: str):
         "role": norm_role,
 
         # core KPIs
-        "kill_participation": _safe_div(me.get("kills",0)+me.get("assists",0), team_kills),
-        "damage_share":       _safe_div(me.get("totalDamageDealtToChampions",0), team_dmg),
+        "kill_participation": _safe_div(m["kills"]+m["assists"], team_kills),
+        "damage_share":       _safe_div(m["totalDamageDealtToChampions"], team_dmg),
         "cs_per_min":         _safe_div(cs, mins),
-        "vision_pm":          _safe_div(me.get("visionScore",0), mins),
+        "vision_pm":          _safe_div(m["visionScore"], mins),
         "objective_contrib":  _safe_div(my_obj, team_obj_total),
 
-        # extended lines
-        "kills": me.get("kills", 0),
-        "deaths": me.get("deaths", 0),
-        "assists": me.get("assists", 0),
-        "kda": _safe_div(me.get("kills",0)+me.get("assists",0), me.get("deaths",1)),
-        "gold_per_min": _safe_div(me.get("goldEarned",0), mins),
-        "dmg_per_min": _safe_div(me.get("totalDamageDealtToChampions",0), mins),
-        "dmg_taken_pm": _safe_div(me.get("totalDamageTaken",0), mins),
+        # extended lines (+ the verbatim ME_COPY counters: kills/deaths/assists, wards,
+        # multikills, damage types, turret/dragon/baron/herald kills, objective damage)
+        **dict(zip(ME_COPY, _copy_me(m))),
+        "kda": _safe_div(m["kills"]+m["assists"], me.get("deaths",1)),
+        "gold_per_min": _safe_div(m["goldEarned"], mins),
+        "dmg_per_min": _safe_div(m["totalDamageDealtToChampions"], mins),
+        "dmg_taken_pm": _safe_div(m["totalDamageTaken"], mins),
         "heal_shield_pm": _safe_div(
-            me.get("totalHealsOnTeammates",0) + me.get("totalDamageShieldedOnTeammates",0),
+            m["totalHealsOnTeammates"] + m["totalDamageShieldedOnTeammates"],
             mins
         ),
-        "vision_wards": me.get("visionWardsBoughtInGame", 0),
-        "wards_killed": me.get("wardsKilled", 0),
         "solo_kills": ch.get("soloKills", 0),
-        "double_kills": me.get("doubleKills", 0),
-        "triple_kills": me.get("tripleKills", 0),
-        "quadra_kills": me.get("quadraKills", 0),
-        "penta_kills": me.get("pentaKills", 0),
-
-        # damage types (to champs)
-        "phys_to_champs": me.get("physicalDamageDealtToChampions", 0),
-        "magic_to_champs": me.get("magicDamageDealtToChampions", 0),
-        "true_to_champs": me.get("trueDamageDealtToChampions", 0),
-
-        # objectives & objective damage
-        "turret_kills": me.get("turretKills", 0),
-        "dragons_killed": p_dragons,
-        "barons_killed":  p_barons,
-        "heralds_killed": p_heralds,
-        "grubs_killed":   p_grubs,
-        "objective_damage": me.get("damageDealtToObjectives", 0),
+        "grubs_killed": p_grubs,
 
         # first blood
         "fb_involved": 1 if fb_self else 0,
@@ -239,11 +339,63 @@ def _aggregate(rows):
     from collections import Counter, defaultdict
     if not rows: return {}
     n = len(rows)
-    mean = lambda k: _safe_div(sum(r.get(k,0) for r in rows), n)
+
+    # rows are AoS dicts; one column array per numeric field makes every mean/sum a C loop
+    arrs = {k: np.fromiter((r.get(k) or 0 for r in rows), dtype=np.float64, count=n) for k in NUMERIC_KEYS}
+    mean  = lambda k: float(arrs[k].mean())
+    total = lambda k: int(arrs[k].sum())
+    win = arrs["win"]
+
+    # ---- single pass over rows for every Counter/tally below ----
+    champs, roles, spell_counts = Counter(), Counter(), Counter()
+    item_result = defaultdict(lambda: {"games":0,"wins":0})
+    duo = defaultdict(lambda: {"games":0,"wins":0,"name":None})
+    split = {b: {"games":0,"wins":0} for b in QUEUE_BUCKET}
+    by_champ = defaultdict(lambda: {
+        "games":0, "wins":0,
+        "games_fb_self":0, "wins_fb_self":0,
+        "games_team_fb":0, "wins_team_fb":0
+    })
+    for r in rows:
+        w = r["win"]
+        c = r.get("champion")
+        if c: champs[c] += 1
+        roles[r.get("role","UNKNOWN")] += 1
+        b = QID_TO_BUCKET.get(r.get("queueId"))
+        if b:
+            split[b]["games"] += 1
+            split[b]["wins"]  += w
+
+        for it in r.get("items_final", ()):
+            ir = item_result[it]
+            ir["games"] += 1
+            ir["wins"]  += w
+
+        s1, s2 = r.get("spell1"), r.get("spell2")
+        if s1: spell_counts[s1] += 1
+        if s2: spell_counts[s2] += 1
+
+        names = r.get("teammate_names", {})
+        for mate in r.get("teammates", ()):
+            d = duo[mate]
+            d["games"] += 1
+            d["wins"]  += w
+            name = names.get(mate)
+            if name: d["name"] = name
+
+        bc = by_champ[c or "Unknown"]
+        bc["games"] += 1
+        bc["wins"]  += w
+        if r.get("fb_self"):
+            bc["games_fb_self"] += 1
+            bc["wins_fb_self"]  += w
+        if r.get("team_first_blood"):
+            bc["games_team_fb"] += 1
+            bc["wins_team_fb"]  += w
 
     agg = {
         "games": n,
-        "winrate": _safe_div(sum(r["win"] for r in rows), n),
+        "winrate": float(win.mean()),
 
         # existing means
         "kill_participation_mean": mean("kill_participation"),
@@ -258,12 +410,12 @@ def _aggregate(rows):
         "dmg_taken_pm_mean": mean("dmg_taken_pm"),
 
         # objectives (totals and per-game)
-        "turrets_killed_total": sum(r.get("turret_kills",0) for r in rows),
-        "dragons_killed_total": sum(r.get("dragons_killed",0) for r in rows),
-        "barons_killed_total":  sum(r.get("barons_killed",0)  for r in rows),
-        "heralds_killed_total": sum(r.get("heralds_killed",0) for r in rows),
-        "grubs_killed_total":   sum(r.get("grubs_killed",0)   for r in rows),
-        "objective_damage_total": sum(r.get("objective_damage",0) for r in rows),
+        "turrets_killed_total": total("turret_kills"),
+        "dragons_killed_total": total("dragons_killed"),
+        "barons_killed_total":  total("barons_killed"),
+        "heralds_killed_total": total("heralds_killed"),
+        "grubs_killed_total":   total("grubs_killed"),
+        "objective_damage_total": total("objective_damage"),
         "objective_damage_pm_mean": mean("objective_damage") / max(mean("time_played_sec")/60.0, 1e-9),
 
         # first blood rate (self)
@@ -274,27 +426,17 @@ def _aggregate(rows):
     }
 
     # --- damage type preference ---
-    phys = sum(r.get("phys_to_champs",0) for r in rows)
-    mag  = sum(r.get("magic_to_champs",0) for r in rows)
-    tru  = sum(r.get("true_to_champs",0)  for r in rows)
+    phys = total("phys_to_champs")
+    mag  = total("magic_to_champs")
+    tru  = total("true_to_champs")
     fav_type = max([("PHYSICAL", phys), ("MAGIC", mag), ("TRUE", tru)], key=lambda x: x[1])[0] if (phys+mag+tru)>0 else None
     agg["favorite_damage_type"] = fav_type
 
     # --- role & champs ---
-    champs = Counter(r.get("champion") for r in rows if r.get("champion"))
-    roles  = Counter(r.get("role","UNKNOWN") for r in rows)
     agg["top_champions"] = [{"name": c, "games": g} for c, g in champs.most_common(5)]
     agg["role_distribution"] = [{"role": r, "games": g} for r, g in roles.most_common()]
 
     # --- items: favorite / best / worst (by winrate) ---
-    item_counts = Counter()
-    item_result = defaultdict(lambda: {"games":0,"wins":0})
-    for r in rows:
-        for it in r.get("items_final", []):
-            item_counts[it] += 1
-            item_result[it]["games"] += 1
-            item_result[it]["wins"]  += r["win"]
-
     def _best_worst_items(min_games=10):
         ranked = []
         for it, res in item_result.items():
@@ -306,32 +448,20 @@ def _aggregate(rows):
         worst = ranked[-5:] if ranked else []
         return best, worst
 
+    # item_result already counts every appearance, in first-seen order (same ties as a Counter)
+    item_counts = Counter({it: res["games"] for it, res in item_result.items()})
     agg["favorite_items"] = [{"itemId": it, "games": cnt} for it, cnt in item_counts.most_common(10)]
     best, worst = _best_worst_items(min_games=10)
     agg["best_items"]  = best
     agg["worst_items"] = worst
 
     # --- summoner spells & flash usage ---
-    spell_counts = Counter()
-    flash_total = 0
-    for r in rows:
-        s1, s2 = r.get("spell1"), r.get("spell2")
-        if s1: spell_counts[s1] += 1
-        if s2: spell_counts[s2] += 1
-        flash_total += r.get("flash_casts", 0)
+    flash_total = total("flash_casts")
     agg["favorite_summoner_spell"] = (spell_counts.most_common(1)[0][0] if spell_counts else None)
     agg["flash_casts_total"] = flash_total
     agg["flash_casts_per_game"] = _safe_div(flash_total, n)
 
     # --- DUO winrates (favorite/best/worst) ---
-    duo = defaultdict(lambda: {"games":0,"wins":0,"name":None})
-    for r in rows:
-        for mate in r.get("teammates", []):
-            duo[mate]["games"] += 1
-            duo[mate]["wins"]  += r["win"]
-            name = r.get("teammate_names", {}).get(mate)
-            if name: duo[mate]["name"] = name
-
     duo_stats = []
     for mate, v in duo.items():
         duo_stats.append({
@@ -350,36 +480,16 @@ def _aggregate(rows):
     agg["duo_worst"] = (min(eligible, key=lambda x: x["winrate"]) if eligible else None)
 
     # --- Queue splits (normals, flex, solo/duo) ---
-    def _split_wr(qset):
-        subset = [r for r in rows if r.get("queueId") in qset]
-        return {
-            "games": len(subset),
-            "winrate": _safe_div(sum(r["win"] for r in subset), len(subset)) if subset else None
-        }
-    agg["split_ranked_solo_duo"] = _split_wr(QUEUE_BUCKET["RANKED_SOLO_DUO"])
-    agg["split_ranked_flex"]     = _split_wr(QUEUE_BUCKET["RANKED_FLEX"])
-    agg["split_normals"]         = _split_wr(QUEUE_BUCKET["NORMALS"])
+    def _split_wr(bucket):
+        g, w = split[bucket]["games"], split[bucket]["wins"]
+        return {"games": g, "winrate": _safe_div(w, g) if g else None}
+    agg["split_ranked_solo_duo"] = _split_wr("RANKED_SOLO_DUO")
+    agg["split_ranked_flex"]     = _split_wr("RANKED_FLEX")
+    agg["split_normals"]         = _split_wr("NORMALS")
 
     # =========================
     # Per-champion winrates (+ FB conditionals)
     # =========================
-    by_champ = defaultdict(lambda: {
-        "games":0, "wins":0,
-        "games_fb_self":0, "wins_fb_self":0,
-        "games_team_fb":0, "wins_team_fb":0
-    })
-    for r in rows:
-        c = r.get("champion") or "Unknown"
-        bc = by_champ[c]
-        bc["games"] += 1
-        bc["wins"]  += r["win"]
-        if r.get("fb_self"):
-            bc["games_fb_self"] += 1
-            bc["wins_fb_self"]  += r["win"]
-        if r.get("team_first_blood"):
-            bc["games_team_fb"] += 1
-            bc["wins_team_fb"]  += r["win"]
-
     champ_wr = []
     for c, v in by_champ.items():
         champ_wr.append({
@@ -396,18 +506,17 @@ def _aggregate(rows):
     # =========================
     # Global conditional winrates
     # =========================
-    def _cond_wr(pred):
-        subset = [r for r in rows if pred(r)]
-        return {
-            "games": len(subset),
-            "winrate": _safe_div(sum(r["win"] for r in subset), len(subset)) if subset else None
-        }
-    agg["when_fb_self"]         = _cond_wr(lambda r: r.get("fb_self"))
-    agg["when_team_first_blood"]= _cond_wr(lambda r: r.get("team_first_blood"))
-    agg["when_first_tower"]     = _cond_wr(lambda r: r.get("team_first_tower"))
-    agg["when_first_dragon"]    = _cond_wr(lambda r: r.get("team_first_dragon"))
-    agg["when_first_baron"]     = _cond_wr(lambda r: r.get("team_first_baron"))
-    agg["when_first_herald"]    = _cond_wr(lambda r: r.get("team_first_herald"))
+    def _wr(mask):
+        g = int(mask.sum())
+        return {"games": g, "winrate": float(win[mask].mean()) if g else None}
+
+    _cond_wr = lambda k: _wr(arrs[k] != 0)
+    agg["when_fb_self"]         = _cond_wr("fb_self")
+    agg["when_team_first_blood"]= _cond_wr("team_first_blood")
+    agg["when_first_tower"]     = _cond_wr("team_first_tower")
+    agg["when_first_dragon"]    = _cond_wr("team_first_dragon")
+    agg["when_first_baron"]     = _cond_wr("team_first_baron")
+    agg["when_first_herald"]    = _cond_wr("team_first_herald")
 
     # =========================
     # Largest gold lead/deficit (REQUIRES TIMELINE)
@@ -418,35 +527,76 @@ def _aggregate(rows):
 
     return agg
 
+# Bump when _features_from_match's row schema changes so stale feature caches are ignored
+FEATURES_VERSION = 1
+
+def _features_key(puuid: str, year: str) -> str:
+    return f"features/{puuid}/{year}.json.gz"
+
+def load_features_from_s3(puuid: str, year: str, match_ids: list) -> list | None:
+    """Cached feature rows, only if they were built from exactly these match ids."""
+    try:
+        obj = s3.get_object(Bucket=S3_BUCKET, Key=_features_key(puuid, year))
+    except ClientError:
+        return None  # not written yet (or unreadable): recompute
+    doc = _gunzip_to_json(obj["Body"].read())
+    if doc.get("version") != FEATURES_VERSION or doc.get("match_ids") != match_ids:
+        return None
+    return doc["rows"]
+
+def write_features_to_s3(puuid: str, year: str, match_ids: list, rows: list):
+    """Upload in the background (overlaps _aggregate); returns the future."""
+    return put_json_gz_async(_features_key(puuid, year), {"version": FEATURES_VERSION, "match_ids": match_ids, "rows": rows})
+
 def write_kpis_to_s3(puuid: str, year: str, kpis: dict) -> str:
-    key = f"kpis/{puuid}/{year}.json"
-    s3.put_object(Bucket=S3_BUCKET, Key=key, Body=json.dumps(kpis).encode("utf-8"), ContentType="application/json")
+    # gzip at rest like matches/timelines; readers fall back to legacy plain .json keys
+    key = f"kpis/{puuid}/{year}.json.gz"
+    put_json_gz(key, kpis)
     return key
 
 if __name__ == "__main__":
-    # CLI usage: python scripts/kpis_basic.py <PUUID> <YEAR> [LIMIT]
-    import sys
-    if len(sys.argv) < 3:
-        print("usage: python scripts/kpis_basic.py <PUUID> <YEAR> [LIMIT]")
+    # CLI usage: python scripts/kpis_basic.py <PUUID> <YEAR> [LIMIT] [--no-cache] [--streaming]
+    ap = argparse.ArgumentParser(description="Compute yearly KPIs for one player from indexed matches")
+    ap.add_argument("puuid")
+    ap.add_argument("year")
+    ap.add_argument("limit", nargs="?", type=int, default=0)
+    ap.add_argument("--no-cache", action="store_true",
+                    help=f"always GET + parse every match (skip {CACHE_DIR} and the features/ cache)")
+    ap.add_argument("--streaming", action="store_true",
+                    help="parse matches incrementally with ijson, keeping only used fields (lower peak memory)")
+    opts = ap.parse_args()
+    if opts.streaming and ijson is None:
+        print("❌ --streaming needs ijson (pip install ijson)")
+        sys.exit(1)
+    if ddb is None:
+        print("❌ DDB_TABLE missing in secrets/.env (needed to find the matches)")
         sys.exit(1)
-    puuid = sys.argv[1]
-    year  = sys.argv[2]
-    limit = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    puuid, year, limit = opts.puuid, opts.year, opts.limit
 
     match_refs = _query_matches(puuid, year)
     if limit: match_refs = match_refs[:limit]
 
-    rows = []
-    for mid, key in match_refs:
-        try:
-            obj = s3.get_object(Bucket=S3_BUCKET, Key=key)
-            mj  = _gunzip_to_json(obj["Body"].read())
-            fr  = _features_from_match(mj, puuid)
-            if fr: rows.append(fr)
-        except Exception as e:
-            print("skip:", e)
+    # Feature rows are a pure function of the match set: reuse them when it hasn't changed
+    match_ids = [mid for mid, _ in match_refs]
+    rows = None if opts.no_cache else load_features_from_s3(puuid, year, match_ids)
+    features_put = None
+    if rows is not None:
+        print(f"♻️ Reusing {len(rows)} cached feature rows from s3://{S3_BUCKET}/{_features_key(puuid, year)}")
+    else:
+        # Drained in match order so most_common()/sort ties stay stable run to run
+        rows, skipped = [], 0
+        for fr in asyncio.run(_load_rows(match_refs, puuid, use_cache=not opts.no_cache, streaming=opts.streaming)):
+            if isinstance(fr, Exception):
+                print("skip:", fr)
+                skipped += 1
+            elif fr:
+                rows.append(fr)
+        if not skipped:  # a transient GET failure must not get baked into the cache
+            features_put = write_features_to_s3(puuid, year, match_ids, rows)
 
     kpis = _aggregate(rows)
     s3_key = write_kpis_to_s3(puuid, year, {"puuid": puuid, "year": year, "kpis": kpis})
+    if features_put is not None:
+        features_put.result()
     print(f"✅ KPIs computed for {len(rows)} matches.\n📦 Saved JSON → s3://{S3_BUCKET}/{s3_key}")
     print(json.dumps(kpis, indent=2))
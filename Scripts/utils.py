@@ -2,10 +2,10 @@
 
 # ----- Imports reused across scripts -----
 from imports import (
-    os, sys, io, time, json, gzip, random, asyncio,
-    Path, quote, datetime, timezone,
-    requests, aiohttp, boto3, load_dotenv,
-    ClientError, NoCredentialsError
+    os, sys, time, gzip, random, asyncio, contextlib, tempfile,
+    quote, parsedate_to_datetime, datetime, timezone, deque, chain, MappingProxyType,
+    Future, ThreadPoolExecutor, lru_cache,
+    orjson, gunzip, requests, HTTPAdapter, Retry, aiohttp, boto3, Config, load_dotenv,
 )
 
 # ----- Env / AWS -----
@@ -16,137 +16,288 @@ S3_BUCKET  = os.getenv("S3_BUCKET")
 DDB_TABLE  = os.getenv("DDB_TABLE")  # optional
 
 HEADERS = {"X-Riot-Token": API_KEY}
-s3  = boto3.client("s3", region_name=AWS_REGION)
+# room for the thread pools that fan out GETs (botocore's default pool is 10)
+s3  = boto3.client("s3", region_name=AWS_REGION, config=Config(max_pool_connections=64))
 ddb = boto3.client("dynamodb", region_name=AWS_REGION) if DDB_TABLE else None
 
 # ===== S3 helpers =====
-def gzip_bytes(obj: dict) -> bytes:
-    b = io.BytesIO()
-    with gzip.GzipFile(fileobj=b, mode="wb") as gz:
-        gz.write(json.dumps(obj).encode("utf-8"))
-    return b.getvalue()
+# Gzipped uploads stay in memory up to this size (about one match), then spill to a temp file
+SPOOL_MAX_BYTES = 1 << 20
 
-def s3_exists(key: str) -> bool:
-    try:
-        s3.head_object(Bucket=S3_BUCKET, Key=key)
-        return True
-    except NoCredentialsError:
-        print("❌ No AWS credentials found. Run `aws configure`.", file=sys.stderr)
-        sys.exit(1)
-    except ClientError as e:
-        code = e.response.get("Error", {}).get("Code")
-        status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
-        if code in ("404", "NoSuchKey") or status == 404:
-            return False
-        if status in (301, 400):
-            print("❌ S3 region or bucket mismatch. Verify AWS_REGION & bucket.", file=sys.stderr)
-            raise
-        raise
+def gzip_spool(obj: dict):
+    """
+    Gzip `obj` as JSON into a spooled buffer (RAM up to SPOOL_MAX_BYTES, then disk),
+    rewound and ready to upload. orjson emits UTF-8 bytes directly, so there is no str copy.
+    """
+    buf = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    # level 1 keeps most of level 9's ratio on JSON at a fraction of the CPU
+    with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=1) as gz:
+        gz.write(orjson.dumps(obj))
+    buf.seek(0)
+    return buf
+
+def ndjson_spool(objs):
+    """gzip_spool for many documents: one compact JSON object per line (NDJSON shard)."""
+    buf = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=1) as gz:
+        for obj in objs:
+            gz.write(orjson.dumps(obj))  # never contains a raw newline
+            gz.write(b"\n")
+    buf.seek(0)
+    return buf
+
+def shard_matches(body: bytes) -> dict:
+    """Gzipped NDJSON match shard -> {match id: match}."""
+    return {m["metadata"]["matchId"]: m for m in map(orjson.loads, gunzip(body).splitlines())}
 
 def put_json_gz(key: str, obj: dict):
-    s3.put_object(
-        Bucket=S3_BUCKET, Key=key,
-        Body=gzip_bytes(obj),
-        ContentType="application/json",
-        ContentEncoding="gzip",
-    )
+    # boto3 streams a seekable file from disk/RAM as-is (no bytes copy); multipart past the threshold
+    with gzip_spool(obj) as body:
+        s3.upload_fileobj(
+            body, S3_BUCKET, key,
+            ExtraArgs={"ContentType": "application/json", "ContentEncoding": "gzip"},
+        )
+
+# boto3 clients are thread-safe: PUTs run here while the caller keeps working
+_S3_POOL = ThreadPoolExecutor(max_workers=32)
+
+def put_json_gz_async(key: str, obj: dict) -> Future:
+    """put_json_gz in the background; call .result() on the future to wait (and re-raise)."""
+    return _S3_POOL.submit(put_json_gz, key, obj)
 
 # ===== Region routing =====
-PLATFORM_BY_REGION = {
+_PLATFORM_BY_REGION = {
     "na":"na1","na1":"na1","br":"br1","br1":"br1","lan":"la1","la1":"la1","las":"la2","la2":"la2",
     "euw":"euw1","euw1":"euw1","eune":"eun1","eun1":"eun1","tr":"tr1","tr1":"tr1","ru":"ru",
     "kr":"kr","jp":"jp1","jp1":"jp1",
     "oce":"oc1","oc1":"oc1","ph":"ph2","ph2":"ph2","sg":"sg2","sg2":"sg2","th":"th2","th2":"th2","tw":"tw2","tw2":"tw2","vn":"vn2","vn2":"vn2",
 }
+# accept "EUW"/"NA1" as typed without a .lower() per lookup; mixed case still needs one
+_PLATFORM_BY_REGION.update({k.upper(): v for k, v in _PLATFORM_BY_REGION.items()})
+
+# regional routing host -> platforms it serves; inverted once into platform -> host
+_REGIONAL_GROUPS = (
+    ("americas", ("na1", "br1", "la1", "la2")),
+    ("europe",   ("euw1", "eun1", "tr1", "ru")),
+    ("asia",     ("kr", "jp1")),
+    ("sea",      ("oc1", "ph2", "sg2", "th2", "tw2", "vn2")),
+)
+_REGIONAL = MappingProxyType({platform: host for host, platforms in _REGIONAL_GROUPS for platform in platforms})
+
+# Read-only views: the tables are fixed at import, nothing should patch them at runtime
+PLATFORM_BY_REGION = MappingProxyType(_PLATFORM_BY_REGION)
+# user-facing region (or platform) -> regional routing host
+PLATFORM_TO_CLUSTER = MappingProxyType({region: _REGIONAL[platform] for region, platform in PLATFORM_BY_REGION.items()})
 
 def regional_from_platform(platform: str) -> str:
-    if platform in {"na1","br1","la1","la2"}: return "americas"
-    if platform in {"euw1","eun1","tr1","ru"}: return "europe"
-    if platform in {"kr","jp1"}: return "asia"
-    if platform in {"oc1","ph2","sg2","th2","tw2","vn2"}: return "sea"
-    return "americas"
+    return _REGIONAL.get(platform, "americas")
+
+# ===== Riot URL templates (regional host first) =====
+_ACCT_URL     = "https://{}.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{}/{}"
+_IDS_URL      = "https://{}.api.riotgames.com/lol/match/v5/matches/by-puuid/{}/ids"
+_MATCH_URL    = "https://{}.api.riotgames.com/lol/match/v5/matches/{}"
+_TIMELINE_URL = _MATCH_URL + "/timeline"
+
+# ===== Retry timing =====
+def _backoff(attempt: int) -> float:
+    """Capped exponential backoff with full jitter (desynchronizes retrying workers)."""
+    return random.uniform(0, min(30, 0.5 * 2 ** attempt))
+
+def _retry_after(headers, default: float = 2) -> float:
+    """Retry-After as seconds; the header may be delta-seconds or an HTTP-date."""
+    value = (headers.get("Retry-After") or "").strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return default
 
 # ===== Sync Riot calls =====
+# One keep-alive pool for every sync Riot call (no TLS handshake per request)
+_SESSION = requests.Session()
+_SESSION.headers.update(HEADERS)  # X-Riot-Token set once, not merged per call
+class _RiotRetry(Retry):
+    # urllib3 would also retry 413/429 that carry Retry-After; 429 must reach _SYNC_LIMITER instead
+    RETRY_AFTER_STATUS_CODES = frozenset({503})
+
+# 5xx and dropped connections are retried inside urllib3 (backoff 0.5, 1, 2, ... s, honoring Retry-After).
+# 429 stays out of it: those go through _SYNC_LIMITER so every caller backs off, not just this one.
+_RETRY = _RiotRetry(total=5, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504),
+                    allowed_methods=frozenset(["GET"]), respect_retry_after_header=True, raise_on_status=False)
+_SESSION.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=_RETRY))
+
 def riot_get_sync(url: str, params=None, max_retries=5):
-    for attempt in range(max_retries):
-        r = requests.get(url, headers=HEADERS, params=params, timeout=30)
-        if r.status_code == 429:
-            wait = int(r.headers.get("Retry-After", "2") or "2")
-            time.sleep(wait); continue
-        if 500 <= r.status_code < 600:
-            time.sleep(1 + attempt); continue
-        r.raise_for_status()
-        return r.json()
+    for _ in range(max_retries):
+        _SYNC_LIMITER.wait_sync()
+        r = _SESSION.get(url, params=params, timeout=30)
+        _SYNC_LIMITER.update(r.headers)
+        if r.status_code != 429:
+            r.raise_for_status()
+            return orjson.loads(r.content)
+        _SYNC_LIMITER.pause(_retry_after(r.headers))
     r.raise_for_status()
 
 def get_puuid_from_riot_id(regional_host: str, riot_id: str) -> str:
     if "#" not in riot_id:
         raise ValueError("Riot ID must be GameName#TAG")
     game, tag = riot_id.split("#", 1)
-    url = f"https://{regional_host}.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{quote(game)}/{quote(tag)}"
+    url = _ACCT_URL.format(regional_host, quote(game, safe=""), quote(tag, safe=""))
     return riot_get_sync(url)["puuid"]
 
-def list_match_ids_year(regional_host: str, puuid: str, year: int) -> list[str]:
-    start_dt = datetime(year, 1, 1, tzinfo=timezone.utc)
-    end_dt   = datetime(year, 12, 31, 23, 59, 59, tzinfo=timezone.utc)
-    start_ts = int(start_dt.timestamp()); end_ts = int(end_dt.timestamp())
-    all_ids, start = [], 0
-    while True:
-        params = {"start": start, "count": 100, "startTime": start_ts, "endTime": end_ts}
-        url = f"https://{regional_host}.api.riotgames.com/lol/match/v5/matches/by-puuid/{puuid}/ids"
-        batch = riot_get_sync(url, params=params)
-        if not batch: break
-        all_ids.extend(batch)
-        start += len(batch)
-        if len(batch) < 100: break
-        time.sleep(0.03)
-    seen, out = set(), []
-    for mid in all_ids:
-        if mid not in seen:
-            seen.add(mid); out.append(mid)
+# ===== Async Riot calls =====
+def riot_session(limit_per_host: int = 20) -> aiohttp.ClientSession:
+    """
+    Shared aiohttp session for a run: keep-alive connections reused across all Riot calls.
+    The connector caps in-flight requests per host and caches DNS; the token rides on the session.
+    """
+    connector = aiohttp.TCPConnector(limit=100, limit_per_host=limit_per_host,
+                                     ttl_dns_cache=300, keepalive_timeout=60)
+    return aiohttp.ClientSession(connector=connector, headers=HEADERS)
+
+def _parse_rate(header: str | None) -> list[tuple[int, int]]:
+    """'20:1,100:120' -> [(20, 1), (100, 120)]  (count:window_seconds pairs)."""
+    if not header:
+        return []
+    out = []
+    for part in header.split(","):
+        n, _, window = part.partition(":")
+        if n.strip().isdigit() and window.strip().isdigit():
+            out.append((int(n), int(window)))
     return out
 
-# ===== Async Riot calls =====
-async def get_json(session: aiohttp.ClientSession, url: str, params=None, retries=5):
+class RiotLimiter:
+    """
+    Sliding-window rate limiter for one Riot API key (in-flight caps live on the
+    riot_session connector).
+    Windows start at the personal-key defaults and are re-read from X-App-Rate-Limit
+    after every response; X-App-Rate-Limit-Count accounts for other users of the key.
+    A 429 pauses every caller for Retry-After.
+    """
+    def __init__(self, limits=((20, 1), (100, 120))):
+        self.limits = list(limits)
+        self.sent = deque()         # monotonic send times, oldest first
+        self.paused_until = 0.0
+
+    async def __aenter__(self):
+        while (delay := self._delay(time.monotonic())) > 0:
+            await asyncio.sleep(delay)
+        self.sent.append(time.monotonic())
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    def wait_sync(self):
+        """Blocking acquire for the requests-based sync path."""
+        while (delay := self._delay(time.monotonic())) > 0:
+            time.sleep(delay)
+        self.sent.append(time.monotonic())
+
+    def _delay(self, now: float) -> float:
+        longest = max(window for _, window in self.limits)
+        while self.sent and now - self.sent[0] >= longest:
+            self.sent.popleft()
+        delay = self.paused_until - now
+        for cap, window in self.limits:
+            recent = [t for t in self.sent if now - t < window]
+            if len(recent) >= cap:
+                delay = max(delay, recent[-cap] + window - now)
+        return delay
+
+    def update(self, headers):
+        limits = _parse_rate(headers.get("X-App-Rate-Limit"))
+        if limits:
+            self.limits = limits
+        now = time.monotonic()
+        for used, window in _parse_rate(headers.get("X-App-Rate-Limit-Count")):
+            seen = sum(1 for t in self.sent if now - t < window)
+            if used > seen:
+                self.sent.extend([now] * (used - seen))
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+# riot_get_sync callers share one window so they stay under the key's limits up front
+_SYNC_LIMITER = RiotLimiter()
+
+async def get_json(session: aiohttp.ClientSession, url: str, params=None, retries=5, limiter: RiotLimiter | None = None):
+    gate = limiter or contextlib.nullcontext()
     for attempt in range(retries):
+        wait = _backoff(attempt)
         try:
-            async with session.get(url, headers=HEADERS, params=params, timeout=aiohttp.ClientTimeout(total=40)) as r:
-                if r.status == 429:
-                    wait = int(r.headers.get("Retry-After", "2"))
-                    await asyncio.sleep(wait); continue
-                if 500 <= r.status < 600:
-                    await asyncio.sleep(1 + attempt + random.random()); continue
-                r.raise_for_status()
-                return await r.json()
+            async with gate:
+                async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=40)) as r:
+                    if limiter:
+                        limiter.update(r.headers)
+                    if r.status == 429:
+                        wait = _retry_after(r.headers)
+                        if limiter:
+                            limiter.pause(wait)
+                    elif not 500 <= r.status < 600:
+                        r.raise_for_status()
+                        return orjson.loads(await r.read())
         except (aiohttp.ClientError, asyncio.TimeoutError):
-            await asyncio.sleep(0.5 + attempt)
+            pass
+        # back off outside the limiter so the slot goes to someone else
+        await asyncio.sleep(wait)
     raise RuntimeError(f"Failed after retries: {url}")
 
-async def fetch_match_detail(session, regional, match_id, sem):
-    async with sem:
-        url = f"https://{regional}.api.riotgames.com/lol/match/v5/matches/{match_id}"
-        return await get_json(session, url)
+@lru_cache(maxsize=16)
+def _year_range(year: int) -> tuple[int, int]:
+    """(startTime, endTime) epoch seconds covering `year` in UTC."""
+    return (int(datetime(year, 1, 1, tzinfo=timezone.utc).timestamp()),
+            int(datetime(year, 12, 31, 23, 59, 59, tzinfo=timezone.utc).timestamp()))
 
-async def fetch_timeline(session, regional, match_id, sem):
-    async with sem:
-        url = f"https://{regional}.api.riotgames.com/lol/match/v5/matches/{match_id}/timeline"
-        return await get_json(session, url)
+MATCH_IDS_PAGE = 100  # Riot's max `count` per match-ids call
+MATCH_IDS_WAVE = 8    # pages requested concurrently once a player has more than one page
+
+async def list_match_ids_year_async(session, regional_host: str, puuid: str, year: int,
+                                    limiter: RiotLimiter | None = None) -> list[str]:
+    """
+    Every match id a player has in `year` (UTC). Page 0 goes alone (most players fit in it); past that,
+    pages are fetched MATCH_IDS_WAVE at a time until one comes back short.
+    """
+    start_ts, end_ts = _year_range(year)
+    url = _IDS_URL.format(regional_host, puuid)
+
+    def page(start):
+        params = {"start": start, "count": MATCH_IDS_PAGE, "startTime": start_ts, "endTime": end_ts}
+        return get_json(session, url, params=params, limiter=limiter)
+
+    batches = [await page(0) or []]
+    start = MATCH_IDS_PAGE
+    while len(batches[-1]) == MATCH_IDS_PAGE:
+        wave = await asyncio.gather(*(page(start + i * MATCH_IDS_PAGE) for i in range(MATCH_IDS_WAVE)))
+        for b in wave:
+            batches.append(b or [])
+            if len(batches[-1]) < MATCH_IDS_PAGE:
+                break
+        start += MATCH_IDS_WAVE * MATCH_IDS_PAGE
+    return list(dict.fromkeys(chain.from_iterable(batches)))  # ordered dedup
+
+async def fetch_match_detail(session, regional, match_id, limiter):
+    return await get_json(session, _MATCH_URL.format(regional, match_id), limiter=limiter)
+
+async def fetch_timeline(session, regional, match_id, limiter):
+    return await get_json(session, _TIMELINE_URL.format(regional, match_id), limiter=limiter)
 
 # ===== DDB index (optional) =====
-def put_index_ddb(puuid: str, year: int, match_json: dict, s3_key_match: str | None, s3_key_timeline: str | None):
-    if not ddb: return
+DDB_BATCH_SIZE = 25  # BatchWriteItem hard limit
+
+def ddb_index_item(puuid: str, year: int, match_json: dict, s3_key_match: str | None, s3_key_timeline: str | None) -> dict:
     info = match_json.get("info", {})
-    parts = info.get("participants", [])
-    me = next((p for p in parts if p.get("puuid")==puuid), {}) if parts else {}
+    info_get = info.get
+    me = {p.get("puuid"): p for p in info_get("participants", ())}.get(puuid, {})
     mid = match_json.get("metadata", {}).get("matchId", "")
     item = {
         "pk": {"S": puuid},
         "sk": {"S": f"{year}#{mid}"},
-        "region": {"S": info.get("platformId","unknown")},
-        "patch": {"S": info.get("gameVersion","")},
-        "queueId": {"N": str(info.get("queueId", 0))},
-        "gameCreation": {"N": str(info.get("gameCreation", 0))},
-        "durationSec": {"N": str(info.get("gameDuration", me.get("timePlayed", 0)))},
+        "region": {"S": info_get("platformId","unknown")},
+        "patch": {"S": info_get("gameVersion","")},
+        "queueId": {"N": str(info_get("queueId", 0))},
+        "gameCreation": {"N": str(info_get("gameCreation", 0))},
+        "durationSec": {"N": str(info_get("gameDuration", me.get("timePlayed", 0)))},
         "champion": {"S": me.get("championName","")},
         "role": {"S": (me.get("teamPosition") or me.get("role") or "")},
     }
@@ -154,4 +305,20 @@ def put_index_ddb(puuid: str, year: int, match_json: dict, s3_key_match: str | N
         item["s3_key_match"] = {"S": s3_key_match}
     if s3_key_timeline:
         item["s3_key_timeline"] = {"S": s3_key_timeline}
-    ddb.put_item(TableName=DDB_TABLE, Item=item)
+    return item
+
+def flush_ddb_batch(items: list[dict], max_retries=8) -> int:
+    """
+    Write up to DDB_BATCH_SIZE items in one BatchWriteItem call, retrying
+    UnprocessedItems with jittered exponential backoff. Returns items written.
+    """
+    if not ddb or not items: return 0
+    pending = [{"PutRequest": {"Item": it}} for it in items]
+    for attempt in range(max_retries):
+        resp = ddb.batch_write_item(RequestItems={DDB_TABLE: pending})
+        pending = resp.get("UnprocessedItems", {}).get(DDB_TABLE, [])
+        if not pending:
+            return len(items)
+        time.sleep(random.uniform(0, min(10, 0.05 * 2 ** attempt)))
+    print(f"ddb: {len(pending)} items still unprocessed after {max_retries} retries", file=sys.stderr)
+    return len(items) - len(pending)